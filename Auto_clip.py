@@ -6,6 +6,9 @@ from pathlib import Path
 from core.auto_correct import auto_correct_subtitles
 from core.auto_detect import auto_detect_files
 from core.metadata import load_source_meta, write_source_meta
+from core.render_pool import print_render_report, render_clips
+from core.source_probe import get_source_probe
+from core.subtitle_utils import SubtitleUtils
 from core.video_processor import VideoProcessor
 
 # ==========================================
@@ -31,6 +34,32 @@ CONFIG = {
         "post_sentences": 2   # 片段向后延伸的句子数量
     },
 
+    # --- [渲染并发配置] ---
+    "render": {
+        "jobs": 1,              # 同时渲染的片段数量（1 = 逐个渲染；多核机器可调大，如 4-8）
+        "threads_per_job": 0,   # 每个 ffmpeg 任务使用的线程数（0 = 由 ffmpeg 自动决定）
+
+        # 剪辑模式：
+        # "reencode"   = 整段重新编码，字幕烧录进画面（默认）
+        # "smart_copy" = 中间完整的 GOP 直接复制，只重编码首尾，速度快、体积小（适合出草稿，要求源视频为 H.264）
+        #                首尾与中间段的参数集不同，mp4 输出使用 avc3 标签携带带内参数集，个别老旧播放器可能不支持
+        "cut_mode": "reencode",
+
+        # 仅 smart_copy 模式生效：字幕作为软字幕轨封装进 .mkv，而不是烧录进画面
+        # 注意：开启后有字幕的片段输出扩展名由 .mp4 变为 .mkv（mp4 无法保留 ASS 样式）
+        # 为 False 时，有字幕的片段会自动回退为重新编码
+        "soft_subs": False,
+
+        # 仅 smart_copy 模式生效：把片段首尾向外对齐到最近的关键帧，整段直接复制、完全不重编码（最快）
+        "snap_to_keyframes": False,
+
+        # 合并渲染：时间上重叠或相邻的片段只解码一次源视频，再分别输出（仅 reencode 模式生效）
+        "group_clips": False,
+        "group_max_gap": 10,        # 片段间隔不超过该秒数时归为一组
+        "group_max_span": 600,      # 单组覆盖的最长源视频时长（秒）
+        "group_max_outputs": 8,     # 单组最多输出的片段数量
+    },
+
     # --- [封面字体配置] ---
     "font_path": os.path.join(os.path.dirname(__file__), "assets", "font", "WenYue-XinQingNianTi-W8-J-2.otf"),
 
@@ -162,7 +191,19 @@ def run_single_clip(
     if output_dir:
         CONFIG['output_dir'] = output_dir
 
-    processor = VideoProcessor(CONFIG, input_dir=CONFIG.get('input_dir'))
+    # 复用 Auto_clip.py 生成的探测缓存（从片段目录向上查找），提前校验时间戳
+    source_probe = get_source_probe(CONFIG['source_video'], CONFIG['output_dir'])
+    if source_probe:
+        start_str, _, end_str = clip_data['timestamp'].partition('-')
+        try:
+            source_probe.clamp_range(
+                SubtitleUtils.parse_srt_time(start_str), SubtitleUtils.parse_srt_time(end_str)
+            )
+        except ValueError as e:
+            print(f"❌ {e}")
+            return
+
+    processor = VideoProcessor(CONFIG, input_dir=CONFIG.get('input_dir'), source_probe=source_probe)
     processor.process_clip(
         1,
         clip_data,
@@ -237,18 +278,13 @@ def main():
     print("=" * 60)
 
     index_width = max(2, len(str(len(clips))))
-    processor = VideoProcessor(CONFIG, input_dir=CONFIG.get('input_dir'))
-    for i, clip in enumerate(clips, 1):
-        try:
-            processor.process_clip(
-                i,
-                clip,
-                generate_cover=False,
-                index_width=index_width,
-                force_regen_ass=False
-            )
-        except Exception as e:
-            print(f"❌ 处理片段 {i} 时出错: {e}")
+    source_probe = get_source_probe(CONFIG['source_video'], output_path_obj)
+    if source_probe:
+        print(f"视频时长: {SubtitleUtils.sec_to_srt_time(source_probe.duration)}")
+    processor = VideoProcessor(CONFIG, input_dir=CONFIG.get('input_dir'), source_probe=source_probe)
+    jobs = CONFIG.get('render', {}).get('jobs', 1)
+    results = render_clips(processor, clips, jobs=jobs, index_width=index_width)
+    print_render_report(results)
 
     print("\n" + "=" * 60)
     print(f"✅ 所有片段处理完毕! 文件保存在: {CONFIG['output_dir']}")
@@ -1,10 +1,98 @@
 import os
 import subprocess
-from PIL import Image, ImageDraw, ImageFont, ImageFilter
+from functools import lru_cache
+from io import BytesIO
+from PIL import Image, ImageChops, ImageDraw, ImageFont, ImageFilter
+
+# 只用于测量文字尺寸的画板
+_MEASURE_DRAW = ImageDraw.Draw(Image.new('L', (1, 1)))
+
+@lru_cache(maxsize=64)
+def load_font(font_path, size):
+    """按 (路径, 字号) 缓存已加载的字体，整个进程共用，避免每张封面都重新解析字体文件"""
+    return ImageFont.truetype(font_path, size)
+
+@lru_cache(maxsize=4096)
+def text_length(font_path, size, text):
+    return _MEASURE_DRAW.textlength(text, font=load_font(font_path, size))
+
+def fit_font(font_path, size, text, max_width):
+    """
+    返回使 text 宽度不超过 max_width 的最大字号（不超过 size）的字体。
+    先按宽度比例估算字号，再在估算值附近倍增确定区间后二分查找，通常只需加载两三个字号。
+    字体无法加载时抛出 IOError。
+    """
+    full_width = text_length(font_path, size, text) if text else 0
+    if full_width <= max_width:
+        return load_font(font_path, size)
+
+    def fits(candidate):
+        return text_length(font_path, candidate, text) <= max_width
+
+    # low 始终是放得下的字号（1 号字作为兜底），high 始终是放不下的字号
+    low, high = 1, size
+    guess = max(1, min(size - 1, int(size * max_width / full_width)))
+    if fits(guess):
+        low = guess
+        step = 1
+        while low + step < high and fits(low + step):
+            low += step
+            step *= 2
+        high = min(high, low + step)
+    else:
+        high = guess
+        step = 1
+        while high - step > low and not fits(high - step):
+            high -= step
+            step *= 2
+        low = max(low, high - step)
+    while high - low > 1:
+        mid = (low + high) // 2
+        if fits(mid):
+            low = mid
+        else:
+            high = mid
+    return load_font(font_path, low)
+
+@lru_cache(maxsize=16)
+def _gradient_overlay(size, start_ratio, opacity):
+    """
+    底部渐变遮罩：黑色 RGBA 图层，alpha 自 start_ratio 处起从 0 线性增至 opacity。
+    先生成 1 像素宽的 alpha 列再横向拉伸，按 (尺寸, 起始比例, 不透明度) 缓存，同一次运行的所有封面共用。
+    opacity 为 0 时返回 None。返回的图层是共享的，使用前需 copy()。
+    """
+    width, height = size
+    start_y = int(height * start_ratio)
+    if opacity <= 0 or start_y >= height:
+        return None
+    span = height - start_y
+    column = bytes(
+        0 if y < start_y else min(255, int((y - start_y) / span * opacity))
+        for y in range(height)
+    )
+    alpha = Image.frombytes('L', (1, height), column).resize(size, Image.Resampling.NEAREST)
+    overlay = Image.new('RGBA', size, (0, 0, 0, 0))
+    overlay.putalpha(alpha)
+    return overlay
+
+@lru_cache(maxsize=32)
+def _prepared_overlay(image_path, mtime, target_size, opacity):
+    """
+    读取并预处理叠加图片（RGBA、缩放、不透明度），按 (路径, 修改时间, 尺寸, 不透明度) 缓存，
+    同一次运行的所有封面只处理一次，之后仅需贴图。返回的图片是共享的，不要原地修改。
+    """
+    overlay_img = Image.open(image_path).convert("RGBA")
+    if target_size:
+        overlay_img = overlay_img.resize(target_size, Image.Resampling.LANCZOS)
+    if opacity < 1.0:
+        alpha = overlay_img.getchannel('A').point([int(p * opacity) for p in range(256)])
+        overlay_img.putalpha(alpha)
+    return overlay_img
 
 class CoverGenerator:
-    def __init__(self, config):
+    def __init__(self, config, source_probe=None):
         self.config = config
+        self.source_probe = source_probe
 
     @staticmethod
     def split_title_smartly(title, max_chars=10):
@@ -16,7 +104,11 @@ class CoverGenerator:
         return title[:mid], title[mid:]
 
     @staticmethod
-    def add_image_to_cover(base_img, image_config):
+    def add_image_to_cover(base_img, image_config, composite=False):
+        """
+        按配置把图片叠加到 base_img 上。composite 为 True 时按 alpha 合成（用于透明的封面图层），
+        否则以图片自身的 alpha 作蒙版直接贴上。
+        """
         image_path = image_config.get('path', '')
         if not image_path or not os.path.exists(image_path):
             if image_path:
@@ -24,16 +116,11 @@ class CoverGenerator:
             return base_img
         
         try:
-            overlay_img = Image.open(image_path).convert("RGBA")
             target_size = image_config.get('size')
-            if target_size:
-                overlay_img = overlay_img.resize(target_size, Image.Resampling.LANCZOS)
-            
-            opacity = image_config.get('opacity', 1.0)
-            if opacity < 1.0:
-                alpha = overlay_img.split()[3]
-                alpha = alpha.point(lambda p: int(p * opacity))
-                overlay_img.putalpha(alpha)
+            overlay_img = _prepared_overlay(
+                os.path.abspath(image_path), os.path.getmtime(image_path),
+                tuple(target_size) if target_size else None, image_config.get('opacity', 1.0)
+            )
             
             base_width, base_height = base_img.size
             img_width, img_height = overlay_img.size
@@ -65,107 +152,227 @@ class CoverGenerator:
             final_x = max(0, min(final_x, base_width - img_width))
             final_y = max(0, min(final_y, base_height - img_height))
             
-            base_img.paste(overlay_img, (final_x, final_y), overlay_img)
+            if composite:
+                base_img.alpha_composite(overlay_img, (final_x, final_y))
+            else:
+                base_img.paste(overlay_img, (final_x, final_y), overlay_img)
         except Exception as e:
             print(f"  ⚠️ 图片叠加失败 ({image_path}): {e}")
         return base_img
 
-    def create_aesthetic_cover(self, video_path, timestamp_sec, cover_text_1, cover_text_2, output_path, style_config, images_list=None):
-        temp_img = output_path.with_suffix('.temp.jpg')
+    @staticmethod
+    def draw_text_with_multilayer_stroke(canvas, position, text, font, fill_color, stroke_color, stroke_width):
+        """原始描边实现：整幅画布的文字层 + 描边层，描边层做 stroke_width 次 3x3 最大值滤波（保留作对照基准）"""
+        x, y = position
+        canvas_width, canvas_height = canvas.size
+
+        text_layer = Image.new('RGBA', (canvas_width, canvas_height), (0, 0, 0, 0))
+        text_draw = ImageDraw.Draw(text_layer)
+        text_draw.text((x, y), text, font=font, fill=fill_color, anchor="mm")
+
+        stroke_layer = Image.new('RGBA', (canvas_width, canvas_height), (0, 0, 0, 0))
+        stroke_draw = ImageDraw.Draw(stroke_layer)
+        stroke_draw.text((x, y), text, font=font, fill=stroke_color, anchor="mm")
+
+        for _ in range(stroke_width):
+            stroke_layer = stroke_layer.filter(ImageFilter.MaxFilter(3))
+
+        canvas.paste(stroke_layer, (0, 0), stroke_layer)
+        canvas.paste(text_layer, (0, 0), text_layer)
+
+    @staticmethod
+    def _dilate(layer, radius):
+        """
+        方形窗口的最大值膨胀，等价于 radius 次 MaxFilter(3)。
+        按行、列分离，每步把已覆盖的窗口平移后取最大值，窗口宽度成倍增长，只需 O(log radius) 步。
+        """
+        for axis in (0, 1):
+            covered = 0
+            while covered < radius:
+                step = min(covered + 1, radius - covered)
+                shifted = []
+                for offset in (step, -step):
+                    moved = Image.new(layer.mode, layer.size, (0,) * len(layer.getbands()))
+                    moved.paste(layer, (offset, 0) if axis == 0 else (0, offset))
+                    shifted.append(moved)
+                layer = ImageChops.lighter(ImageChops.lighter(layer, shifted[0]), shifted[1])
+                covered += step
+        return layer
+
+    @staticmethod
+    def draw_text_with_stroke(canvas, position, text, font, fill_color, stroke_color, stroke_width):
+        """
+        与 draw_text_with_multilayer_stroke 像素一致的快速描边：只在文字包围盒外扩描边宽度的区域内绘制，
+        膨胀一次完成，再按蒙版贴回画布。
+        """
+        x, y = position
+        canvas_width, canvas_height = canvas.size
+        stroke_width = max(0, int(stroke_width))
+
+        left, top, right, bottom = _MEASURE_DRAW.textbbox((x, y), text, font=font, anchor="mm")
+        # 包围盒按字体度量计算，个别字形会略微超出，额外留出余量
+        margin = stroke_width + max(4, getattr(font, 'size', 0) // 8)
+        box_left = max(0, int(left) - margin)
+        box_top = max(0, int(top) - margin)
+        box_right = min(canvas_width, int(right) + margin + 1)
+        box_bottom = min(canvas_height, int(bottom) + margin + 1)
+        if box_right <= box_left or box_bottom <= box_top:
+            return
+
+        region = (box_right - box_left, box_bottom - box_top)
+        local = (x - box_left, y - box_top)
+
+        text_layer = Image.new('RGBA', region, (0, 0, 0, 0))
+        ImageDraw.Draw(text_layer).text(local, text, font=font, fill=fill_color, anchor="mm")
+
+        stroke_layer = Image.new('RGBA', region, (0, 0, 0, 0))
+        ImageDraw.Draw(stroke_layer).text(local, text, font=font, fill=stroke_color, anchor="mm")
+        if stroke_width:
+            stroke_layer = CoverGenerator._dilate(stroke_layer, stroke_width)
+
+        canvas.paste(stroke_layer, (box_left, box_top), stroke_layer)
+        canvas.paste(text_layer, (box_left, box_top), text_layer)
+
+    def _clamp_timestamp(self, timestamp_sec):
+        if self.source_probe and self.source_probe.duration:
+            # 超出视频末尾时 ffmpeg 取不到画面，退回到最后一秒内
+            return min(timestamp_sec, max(0.0, self.source_probe.duration - 1.0))
+        return timestamp_sec
+
+    @staticmethod
+    def _extract_single_frame(video_path, timestamp_sec):
+        """单帧提取：以 BMP 经管道直接读入 Pillow，不落地临时文件"""
         cmd = [
             'ffmpeg', '-ss', str(timestamp_sec), '-i', video_path,
-            '-frames:v', '1', '-q:v', '2', '-y', str(temp_img)
+            '-frames:v', '1', '-f', 'image2pipe', '-c:v', 'bmp', 'pipe:1'
         ]
-        subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        if not temp_img.exists():
-            return
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        if not result.stdout:
+            return None
+        try:
+            return Image.open(BytesIO(result.stdout)).convert('RGB')
+        except Exception:
+            return None
+
+    @staticmethod
+    def _split_bmp_stream(data):
+        """按 BMP 文件头中的文件大小切分 image2pipe 输出的连续 BMP 图像"""
+        frames = []
+        pos = 0
+        while data[pos:pos + 2] == b'BM' and pos + 6 <= len(data):
+            size = int.from_bytes(data[pos + 2:pos + 6], 'little')
+            if size <= 6 or pos + size > len(data):
+                break
+            frames.append(data[pos:pos + size])
+            pos += size
+        return frames
 
+    def extract_frames(self, video_path, timestamps):
+        """
+        一次 ffmpeg 调用提取所有时间点的画面：每个时间点作为一路快速 seek 的输入，
+        各取一帧后 concat，以 BMP 序列经管道读入 Pillow。
+        画面尺寸取自解码输出的 BMP 文件头，而不是探测结果，旋转（自动转正后宽高互换）的视频也能正确切分。
+        -fps_mode 需要 ffmpeg 5.0 及以上；批量提取失败时逐帧提取。
+        返回与 timestamps 一一对应的 RGB 图像列表（失败的位置为 None）。
+        """
+        timestamps = [self._clamp_timestamp(t) for t in timestamps]
+        if not timestamps:
+            return []
+
+        cmd = ['ffmpeg']
+        for t in timestamps:
+            cmd.extend(['-ss', str(t), '-i', video_path])
+        count = len(timestamps)
+        chains = [f"[{i}:v:0]trim=end_frame=1,setpts=PTS-STARTPTS[f{i}]" for i in range(count)]
+        inputs = ''.join(f"[f{i}]" for i in range(count))
+        chains.append(f"{inputs}concat=n={count}:v=1:a=0[out]")
+        cmd.extend([
+            '-filter_complex', ';'.join(chains), '-map', '[out]', '-fps_mode', 'passthrough',
+            '-f', 'image2pipe', '-c:v', 'bmp', 'pipe:1'
+        ])
+        result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        frames = self._split_bmp_stream(result.stdout)
+        if len(frames) == count:
+            try:
+                return [Image.open(BytesIO(frame)).convert('RGB') for frame in frames]
+            except Exception:
+                pass
+
+        return [self._extract_single_frame(video_path, t) for t in timestamps]
+
+    def create_aesthetic_cover(self, video_path, timestamp_sec, cover_text_1, cover_text_2, output_path, style_config, images_list=None):
+        frame = self.extract_frames(video_path, [timestamp_sec])[0]
+        if frame is None:
+            return
         try:
-            img = Image.open(temp_img).convert("RGBA")
-            width, height = img.size
-            
-            if style_config.get('blur_background', False):
-                img = img.filter(ImageFilter.GaussianBlur(style_config.get('blur_radius', 3)))
-            
-            overlay = Image.new('RGBA', img.size, (0, 0, 0, 0))
-            draw = ImageDraw.Draw(overlay)
-
-            gradient_start_y = int(height * style_config.get('gradient_start_y', 0.6))
-            gradient_opacity = style_config.get('gradient_opacity', 200)
-            for y in range(gradient_start_y, height):
-                progress = (y - gradient_start_y) / (height - gradient_start_y)
-                alpha = int(progress * gradient_opacity)
-                draw.line([(0, y), (width, y)], fill=(0, 0, 0, alpha))
-            
+            cover_layer = self.build_cover_layer(frame.size, cover_text_1, cover_text_2, style_config, images_list)
+        except Exception as e:
+            print(f"⚠️ 封面生成失败: {e}")
+            return
+        self.render_cover(frame, cover_layer, output_path, style_config)
+
+    def build_cover_layer(self, size, cover_text_1, cover_text_2, style_config, images_list=None):
+        """
+        生成封面的前景图层（渐变、描边标题、叠加图片），与背景画面无关，
+        同一片段的多张封面只需生成一次，再分别合成到各自的画面上。
+        """
+        width, height = size
+        gradient = _gradient_overlay(
+            size, style_config.get('gradient_start_y', 0.6), style_config.get('gradient_opacity', 200)
+        )
+        overlay = gradient.copy() if gradient else Image.new('RGBA', size, (0, 0, 0, 0))
+
+        font_path = self.config['font_path']
+        max_text_width = width - 100
+
+        def title_font(text):
+            # 标题过宽时缩小字号直到放得下（两行布局逐行适配）
             try:
-                font_path = self.config['font_path']
-                title_font = ImageFont.truetype(font_path, style_config['title_size'])
+                return fit_font(font_path, style_config['title_size'], text, max_text_width)
             except IOError:
-                title_font = ImageFont.load_default()
+                return ImageFont.load_default()
 
-            layout = style_config.get('layout', 'bottom')
-            
-            def draw_text_with_multilayer_stroke(draw, position, text, font, fill_color, stroke_color, stroke_width):
-                x, y = position
-                canvas = draw._image
-                canvas_width, canvas_height = canvas.size
-                
-                text_layer = Image.new('RGBA', (canvas_width, canvas_height), (0, 0, 0, 0))
-                text_draw = ImageDraw.Draw(text_layer)
-                text_draw.text((x, y), text, font=font, fill=fill_color, anchor="mm")
-                
-                stroke_layer = Image.new('RGBA', (canvas_width, canvas_height), (0, 0, 0, 0))
-                stroke_draw = ImageDraw.Draw(stroke_layer)
-                stroke_draw.text((x, y), text, font=font, fill=stroke_color, anchor="mm")
-                
-                for _ in range(stroke_width):
-                    stroke_layer = stroke_layer.filter(ImageFilter.MaxFilter(3))
-                
-                canvas.paste(stroke_layer, (0, 0), stroke_layer)
-                canvas.paste(text_layer, (0, 0), text_layer)
-            
-            if layout == "double" and style_config.get('title_position') == "split":
-                y1 = int(height * style_config.get('title_top_y_ratio', 0.2))
-                top_color = style_config.get('title_top_color', style_config.get('title_color', (255, 255, 255)))
-                draw_text_with_multilayer_stroke(
-                    draw, (width / 2, y1), cover_text_1, title_font,
-                    top_color, style_config['title_stroke_color'], style_config['title_stroke_width']
-                )
-                if cover_text_2:
-                    y2 = int(height * style_config.get('title_bottom_y_ratio', 0.75))
-                    bottom_color = style_config.get('title_bottom_color', style_config.get('title_color', (255, 255, 255)))
-                    draw_text_with_multilayer_stroke(
-                        draw, (width / 2, y2), cover_text_2, title_font,
-                        bottom_color, style_config['title_stroke_color'], style_config['title_stroke_width']
-                    )
-            else:
-                title_y = int(height * style_config.get('title_y_ratio', 0.85))
-                text_width = draw.textlength(cover_text_1, font=title_font)
-                if text_width > width - 100:
-                    scaled_size = int(style_config['title_size'] * (width - 100) / text_width)
-                    title_font = ImageFont.truetype(font_path, scaled_size)
-                
-                draw_text_with_multilayer_stroke(
-                    draw, (width / 2, title_y), cover_text_1, title_font,
-                    style_config['title_color'], style_config['title_stroke_color'], style_config['title_stroke_width']
+        layout = style_config.get('layout', 'bottom')
+        
+        if layout == "double" and style_config.get('title_position') == "split":
+            y1 = int(height * style_config.get('title_top_y_ratio', 0.2))
+            top_color = style_config.get('title_top_color', style_config.get('title_color', (255, 255, 255)))
+            CoverGenerator.draw_text_with_stroke(
+                overlay, (width / 2, y1), cover_text_1, title_font(cover_text_1),
+                top_color, style_config['title_stroke_color'], style_config['title_stroke_width']
+            )
+            if cover_text_2:
+                y2 = int(height * style_config.get('title_bottom_y_ratio', 0.75))
+                bottom_color = style_config.get('title_bottom_color', style_config.get('title_color', (255, 255, 255)))
+                CoverGenerator.draw_text_with_stroke(
+                    overlay, (width / 2, y2), cover_text_2, title_font(cover_text_2),
+                    bottom_color, style_config['title_stroke_color'], style_config['title_stroke_width']
                 )
+        else:
+            title_y = int(height * style_config.get('title_y_ratio', 0.85))
+            CoverGenerator.draw_text_with_stroke(
+                overlay, (width / 2, title_y), cover_text_1, title_font(cover_text_1),
+                style_config['title_color'], style_config['title_stroke_color'], style_config['title_stroke_width']
+            )
+
+        for image_config in images_list or []:
+            if isinstance(image_config, dict):
+                CoverGenerator.add_image_to_cover(overlay, image_config, composite=True)
+        return overlay
 
-            img = Image.alpha_composite(img, overlay)
+    def render_cover(self, frame, cover_layer, output_path, style_config):
+        try:
+            img = frame.convert("RGBA")
             
-            images_list = images_list or []
-            if images_list:
-                for image_config in images_list:
-                    if isinstance(image_config, dict):
-                        img = CoverGenerator.add_image_to_cover(img, image_config)
+            if style_config.get('blur_background', False):
+                img = img.filter(ImageFilter.GaussianBlur(style_config.get('blur_radius', 3)))
+            img = Image.alpha_composite(img, cover_layer)
 
             final_img = img.convert('RGB')
             final_img = final_img.filter(ImageFilter.SHARPEN)
             final_img.save(output_path, quality=95)
         except Exception as e:
             print(f"⚠️ 封面生成失败: {e}")
-        finally:
-            if temp_img.exists():
-                temp_img.unlink()
 
     def create_multiple_covers(self, video_path, start_sec, end_sec, cover_text_1, cover_text_2, base_output_path, cover_count, cover_config=None):
         duration = end_sec - start_sec
@@ -187,13 +394,25 @@ class CoverGenerator:
         else:
             positions = [0.2 + (0.6 / (cover_count - 1)) * i for i in range(cover_count)]
         
+        timestamps = [start_sec + duration * pos for pos in positions]
+        frames = self.extract_frames(video_path, timestamps)
+
         generated_covers = []
-        for i, pos in enumerate(positions, 1):
-            timestamp = start_sec + duration * pos
+        cover_layers = {}
+        for i, frame in enumerate(frames, 1):
+            if frame is None:
+                continue
+            if frame.size not in cover_layers:
+                try:
+                    cover_layers[frame.size] = self.build_cover_layer(
+                        frame.size, cover_text_1, cover_text_2, style_config, images_list
+                    )
+                except Exception as e:
+                    print(f"⚠️ 封面生成失败: {e}")
+                    return generated_covers
+            cover_layer = cover_layers[frame.size]
             output_path = base_output_path.parent / f"{base_output_path.stem}_cover{i}{base_output_path.suffix}"
-            self.create_aesthetic_cover(
-                video_path, timestamp, cover_text_1, cover_text_2, output_path, style_config, images_list
-            )
+            self.render_cover(frame, cover_layer, output_path, style_config)
             if output_path.exists():
                 generated_covers.append(output_path)
         
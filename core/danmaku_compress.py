@@ -0,0 +1,64 @@
+import re
+import unicodedata
+from functools import lru_cache
+
+# 连续 3 个及以上相同字符折叠为 2 个：哈哈哈哈哈 / 哈哈哈 -> 哈哈
+_REPEAT_RE = re.compile(r'(.)\1{2,}')
+# 纯标点弹幕的重复全部折叠为 1 个：？？？ / ? -> ?
+_PUNCT_REPEAT_RE = re.compile(r'(.)\1+')
+# 折叠后只由 哈 / h 组成的弹幕都视为"笑"（hhhhh、哈哈哈、哈h哈h）
+_LAUGH_RE = re.compile(r'[哈h]{2,}')
+
+@lru_cache(maxsize=65536)
+def normalize_danmaku(text):
+    """
+    归一化弹幕用于近似去重：NFKC 统一全角/半角（？→?、ｈ→h），转小写，折叠重复字符，
+    去掉标点与空白（纯标点的弹幕保留标点并折叠为单个，如 ？？？ -> ?）。
+    """
+    text = _REPEAT_RE.sub(r'\1\1', unicodedata.normalize('NFKC', text).lower().strip())
+    stripped = ''.join(
+        ch for ch in text
+        if not unicodedata.category(ch).startswith(('P', 'Z')) and not ch.isspace()
+    )
+    if not stripped:
+        return _PUNCT_REPEAT_RE.sub(r'\1', text)
+    if _LAUGH_RE.fullmatch(stripped):
+        return '哈哈'
+    return stripped
+
+def estimate_tokens(text):
+    """粗略估算 token 数：非 ASCII 字符（中文等）按 1 个计，ASCII 按 4 个字符 1 个计"""
+    ascii_count = sum(1 for ch in text if ord(ch) < 128)
+    return len(text) - ascii_count + (ascii_count + 3) // 4
+
+def compress_danmaku(texts, token_budget=300):
+    """
+    把一段弹幕压缩为 "文本 ×次数" 行：归一化后相同的弹幕合为一组，以组内最常见的原始写法展示，
+    按次数从多到少（次数相同按出现先后）依次放入，估算 token 总数不超过 token_budget。
+    """
+    groups = {}
+    for text in texts:
+        variants = groups.setdefault(normalize_danmaku(text), {})
+        variants[text] = variants.get(text, 0) + 1
+
+    ranked = []
+    for variants in groups.values():
+        total = sum(variants.values())
+        display = max(variants, key=variants.__getitem__)
+        ranked.append((total, display))
+    # sorted 是稳定排序，次数相同的组保持首次出现的顺序
+    ranked.sort(key=lambda item: item[0], reverse=True)
+
+    lines = []
+    remaining = token_budget
+    for total, display in ranked:
+        line = f"{display} ×{total}" if total > 1 else display
+        # 每行另有列表前缀与换行的开销
+        cost = estimate_tokens(line) + 2
+        if cost > remaining:
+            continue
+        lines.append(line)
+        remaining -= cost
+        if remaining <= 2:
+            break
+    return lines
@@ -0,0 +1,116 @@
+import heapq
+
+import numpy as np
+
+# 窗口热度是浮点权重的差分累加和，舍入到该位数以消除累加误差，保证热度相同的窗口仍然严格相等
+SCORE_DECIMALS = 6
+
+class DanmakuDensity:
+    """
+    逐秒的弹幕窗口密度（稠密数组）。
+    下标 i 对应第 origin + i 秒，scores[w][i] / counts[w][i] 为 [origin + i, origin + i + w) 秒内的加权热度与弹幕数。
+    """
+
+    def __init__(self, origin, scores, counts):
+        self.origin = origin
+        self.scores = scores
+        self.counts = counts
+
+    def __len__(self):
+        return len(next(iter(self.scores.values()), ()))
+
+    @property
+    def window_sizes(self):
+        return tuple(self.scores)
+
+    @property
+    def seconds(self):
+        return np.arange(self.origin, self.origin + len(self), dtype=np.int64)
+
+    def score(self, window_size):
+        return self.scores[window_size]
+
+    def count(self, window_size):
+        return self.counts[window_size]
+
+def compute_density(times, weights, window_sizes):
+    """
+    一次分桶、多个窗口：先用 bincount 得到每秒的热度与弹幕数，再对前缀和做差分，
+    每个窗口和都是 O(1)，整体为 O(弹幕数 + 时长 × 窗口种类数)。
+    times 为弹幕时间（秒），weights 为对应权重；没有弹幕时返回 None。
+    """
+    times = np.asarray(times, dtype=np.float64)
+    if times.size == 0:
+        return None
+    weights = np.asarray(weights, dtype=np.float64)
+
+    seconds = times.astype(np.int64)
+    origin = int(seconds.min())
+    length = int(seconds.max()) - origin + 1
+    bins = seconds - origin
+    per_second_score = np.bincount(bins, weights=weights, minlength=length)
+    per_second_count = np.bincount(bins, minlength=length)
+
+    score_prefix = np.concatenate(([0.0], np.cumsum(per_second_score)))
+    count_prefix = np.concatenate(([0], np.cumsum(per_second_count)))
+    starts = np.arange(length)
+
+    scores = {}
+    counts = {}
+    for window_size in dict.fromkeys(window_sizes):
+        ends = np.minimum(starts + window_size, length)
+        scores[window_size] = np.round(score_prefix[ends] - score_prefix[starts], SCORE_DECIMALS)
+        counts[window_size] = count_prefix[ends] - count_prefix[starts]
+    return DanmakuDensity(origin, scores, counts)
+
+def descending_rank_value(values, fraction):
+    """
+    返回 values 降序排列后第 int(len * fraction) 个元素（如 fraction=0.1 即 P90），
+    用 np.partition 选择而不是完整排序。
+    """
+    values = np.asarray(values)
+    kth = len(values) - 1 - int(len(values) * fraction)
+    return np.partition(values, kth)[kth]
+
+def _sliding_max(values, radius, direction):
+    """
+    每个位置向一侧 radius 个元素（不含自身）的最大值，超出边界的部分按 -inf 处理。
+    direction=1 看右侧，-1 看左侧；窗口宽度按 1, 2, 4... 倍增，只需 O(log radius) 次向量运算。
+    """
+    length = len(values)
+    result = np.full(length, -np.inf)
+    if radius <= 0 or length == 0:
+        return result
+    # covered[i] = values[i .. i+w-1] 的最大值（朝 direction 方向），从 w=1 开始倍增
+    covered = values.astype(np.float64, copy=True)
+    width = 1
+    while width < radius:
+        step = min(width, radius - width)
+        if step < length:
+            shifted = np.full(length, -np.inf)
+            if direction > 0:
+                shifted[:length - step] = covered[step:]
+            else:
+                shifted[step:] = covered[:length - step]
+            covered = np.maximum(covered, shifted)
+        width += step
+    if direction > 0:
+        result[:length - 1] = covered[1:]
+    else:
+        result[1:] = covered[:length - 1]
+    return result
+
+def pick_peaks(scores, threshold, radius, top_k):
+    """
+    在 scores 中挑选不低于 threshold 的局部峰值：前后 radius 个位置内最大者才保留（非极大值抑制），
+    平台（相邻的相同热度）只保留最早的一个；radius 为 0 时不做抑制。
+    返回热度最高的 top_k 个下标，按热度降序、热度相同按时间先后。
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    mask = (scores > 0) & (scores >= threshold)
+    if radius > 0:
+        mask &= scores > _sliding_max(scores, radius, -1)
+        mask &= scores >= _sliding_max(scores, radius, 1)
+    candidates = np.flatnonzero(mask)
+    top = heapq.nlargest(top_k, candidates.tolist(), key=scores.__getitem__)
+    return np.asarray(top, dtype=np.int64)
@@ -0,0 +1,91 @@
+import re
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+
+# 匹配 Dialogue 行的开头直到开始时间之后（Layer, Start, End），其余 7 个字段按逗号切分
+_DIALOGUE_RE = re.compile(r'Dialogue:\s*\d+,(\d+):(\d+):(\d+\.\d+),\d+:\d+:\d+\.\d+,')
+_OVERRIDE_TAG_RE = re.compile(r'\{[^}]*\}')
+# 删除控制字符 (\x00-\x1f, \x7f-\x9f)
+_CONTROL_CHARS = dict.fromkeys([*range(0x00, 0x20), *range(0x7f, 0xa0)])
+
+class DanmakuStore:
+    """
+    按列存储的弹幕：时间为 float64 数组，文本为驻留 (intern) 后的字符串列表，重复弹幕共用同一个字符串对象。
+    迭代或下标访问时按需生成 {'time', 'text'} 字典，与原先的字典列表用法兼容。
+    """
+
+    __slots__ = ('times', 'texts', '_sorted')
+
+    def __init__(self):
+        self.times = array('d')
+        self.texts = []
+        self._sorted = True
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __iter__(self):
+        for t, text in zip(self.times, self.texts):
+            yield {'time': t, 'text': text}
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [{'time': t, 'text': text} for t, text in zip(self.times[index], self.texts[index])]
+        return {'time': self.times[index], 'text': self.texts[index]}
+
+    def append(self, t, text):
+        if self._sorted and self.times and t < self.times[-1]:
+            self._sorted = False
+        self.times.append(t)
+        self.texts.append(sys.intern(text))
+
+    def sort(self):
+        """按时间稳定排序（已有序时不做任何事）"""
+        if self._sorted:
+            return
+        order = sorted(range(len(self.times)), key=self.times.__getitem__)
+        self.times = array('d', (self.times[i] for i in order))
+        self.texts = [self.texts[i] for i in order]
+        self._sorted = True
+
+    def range_indices(self, start, end):
+        """时间落在 [start, end] 内的弹幕下标范围 (lo, hi)，需先 sort()"""
+        return bisect_left(self.times, start), bisect_right(self.times, end)
+
+def clean_danmaku_text(raw_text):
+    """去掉 ASS 特效标签与控制字符"""
+    if '{' in raw_text:
+        raw_text = _OVERRIDE_TAG_RE.sub('', raw_text)
+    return raw_text.strip().translate(_CONTROL_CHARS)
+
+def parse_dialogue_line(line):
+    """解析一行 ASS Dialogue，返回 (开始秒数, 清洗后的文本)；不是弹幕行时返回 None"""
+    match = _DIALOGUE_RE.search(line)
+    if not match:
+        return None
+    parts = line[match.end():].split(',', 6)
+    if len(parts) != 7:
+        return None
+    h, m, s = match.groups()
+    start_time = int(h) * 3600 + int(m) * 60 + float(s)
+    return start_time, clean_danmaku_text(parts[6].rstrip('\n'))
+
+def load_ass_danmaku(ass_path, store=None):
+    """
+    逐行流式读取 ASS 弹幕文件，内存占用只与弹幕列存储本身有关。
+    跳过空文本与开始时间为 0 的弹幕，结果按时间排序。
+    """
+    store = store if store is not None else DanmakuStore()
+    with open(ass_path, 'r', encoding='utf-8-sig') as f:
+        for line in f:
+            if 'Dialogue:' not in line:
+                continue
+            parsed = parse_dialogue_line(line)
+            if parsed is None:
+                continue
+            start_time, text = parsed
+            if text and start_time > 0:
+                store.append(start_time, text)
+    store.sort()
+    return store
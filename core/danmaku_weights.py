@@ -0,0 +1,63 @@
+import re
+from functools import lru_cache
+
+import numpy as np
+
+# 反向引用在合并后的正则里分组序号会变化，含有它的规则表不做合并
+_BACKREFERENCE_RE = re.compile(r'\\[1-9]|\(\?P=')
+
+class WeightClassifier:
+    """
+    弹幕权重分类器：规则表 [(正则, 权重), ...] 合并为一个正则，每条规则是一个可选的零宽前瞻命名分组，
+    一次匹配就能知道命中了哪些规则；结果按弹幕文本缓存（直播弹幕高度重复）。
+    权重取 1.0、命中规则的权重与长弹幕加成中的最大值，与逐条 re.search 的结果一致。
+    """
+
+    def __init__(self, rules, long_text_bonus=None, cache_size=65536):
+        self.rules = list(rules)
+        self.long_text_bonus = long_text_bonus
+        self._group_scores = []
+        try:
+            if any(_BACKREFERENCE_RE.search(pattern) for pattern, _ in self.rules):
+                raise re.error("backreference")
+            parts = []
+            for i, (pattern, score) in enumerate(self.rules):
+                # 用 [\s\S]*? 而不是 DOTALL，避免改变规则中 "." 的含义
+                parts.append(rf"(?:(?=[\s\S]*?(?P<_rule{i}>{pattern})))?")
+                self._group_scores.append((f"_rule{i}", score))
+            self._combined = re.compile(''.join(parts), re.IGNORECASE)
+        except re.error:
+            # 规则无法合并（如含反向引用）时，逐条匹配
+            self._combined = None
+            self._compiled = [(re.compile(pattern, re.IGNORECASE), score) for pattern, score in self.rules]
+        self.weight = lru_cache(maxsize=cache_size)(self._classify)
+
+    def _classify(self, text):
+        weight = 1.0
+        if self._combined is not None:
+            match = self._combined.match(text)
+            for name, score in self._group_scores:
+                if match.group(name) is not None:
+                    weight = max(weight, score)
+        else:
+            for pattern, score in self._compiled:
+                if pattern.search(text):
+                    weight = max(weight, score)
+        if self.long_text_bonus:
+            limit, bonus = self.long_text_bonus
+            if len(text) >= limit:
+                weight = max(weight, bonus)
+        return weight
+
+    def weights(self, texts):
+        """批量计算一列弹幕的权重，返回 float64 数组；同一批内重复的文本只分类一次"""
+        seen = {}
+        weight = self.weight
+
+        def lookup(text):
+            value = seen.get(text)
+            if value is None:
+                value = seen[text] = weight(text)
+            return value
+
+        return np.fromiter((lookup(text) for text in texts), dtype=np.float64, count=len(texts))
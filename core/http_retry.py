@@ -0,0 +1,20 @@
+import random
+
+# ==================== HTTP 重试等待时间 ====================
+# AI 接口客户端 (core/llm_client.py) 与弹幕分片下载 (utils/segment_fetcher.py) 共用
+
+# 服务端要求的 Retry-After 最多等待这么多秒，避免一个工作线程被挂起过久
+MAX_RETRY_AFTER = 60
+
+def retry_delay(attempt, backoff, response=None, max_retry_after=MAX_RETRY_AFTER):
+    """
+    第 attempt 次（从 0 开始）失败后重试前的等待秒数。
+    响应带有可解析的 Retry-After（秒）时照办，但不超过 max_retry_after；
+    否则按带随机抖动的指数退避，避免并发请求同时重试。
+    """
+    if response is not None:
+        try:
+            return min(max(0.0, float(response.headers.get('Retry-After'))), max_retry_after)
+        except (TypeError, ValueError):
+            pass
+    return backoff * (2 ** attempt) * (0.5 + random.random() / 2)
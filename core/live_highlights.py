@@ -0,0 +1,236 @@
+import os
+import selectors
+import socket
+import sys
+import time
+from collections import deque
+
+from core.danmaku_store import load_ass_danmaku, parse_dialogue_line
+
+class LiveHighlightDetector:
+    """
+    实时弹幕高光检测：维护最近 window_size 秒的滑动窗口加权热度（每条弹幕 O(1) 更新），
+    窗口热度达到 threshold 即进入高潮，低于阈值超过 merge_gap 秒后视为高潮结束，
+    立即输出与 DanmakuAnalyzer.find_highlights 相同结构的片段 {'start', 'end', 'score', 'count'}。
+    弹幕需按时间顺序送入。输出的片段互不重叠：新片段的起点不早于上一个片段的终点。
+    """
+
+    def __init__(self, classifier, window_size=10, threshold=30, merge_gap=10, lookback=5,
+                 min_duration=10, max_duration=90, on_highlight=None):
+        self.classifier = classifier
+        self.window_size = window_size
+        self.threshold = threshold
+        self.merge_gap = merge_gap
+        self.lookback = lookback
+        self.min_duration = min_duration
+        self.max_duration = max_duration
+        self.on_highlight = on_highlight
+
+        self._window = deque()
+        self.window_score = 0.0
+        self.window_count = 0
+        self.current_time = 0.0
+        self._burst = None
+        self._last_end = 0
+
+    def push(self, t, text):
+        """送入一条弹幕，返回因此结束的高光片段列表"""
+        emitted = self.advance(t)
+        weight = self.classifier.weight(text)
+        self._window.append((t, weight))
+        self.window_score += weight
+        self.window_count += 1
+
+        burst = self._burst
+        if burst is not None:
+            burst['count'] += 1
+        if self.window_score >= self.threshold:
+            if burst is None:
+                self._burst = {
+                    'first': t, 'last': t, 'score': self.window_score, 'count': self.window_count
+                }
+            else:
+                burst['last'] = t
+                burst['score'] = max(burst['score'], self.window_score)
+                start, end = self._span(burst)
+                if end - start >= self.max_duration:
+                    # 超长的高潮按最大时长截断输出，之后的部分作为新的片段
+                    emitted.extend(self._close())
+        return emitted
+
+    def advance(self, t):
+        """把时间推进到 t（没有新弹幕时也可调用），移出窗口外的弹幕，返回因此结束的高光片段列表"""
+        self.current_time = max(self.current_time, t)
+        window_start = self.current_time - self.window_size
+        window = self._window
+        while window and window[0][0] <= window_start:
+            _, weight = window.popleft()
+            self.window_score -= weight
+            self.window_count -= 1
+        if not window:
+            # 窗口清空时归零，消除浮点累加误差
+            self.window_score = 0.0
+
+        burst = self._burst
+        if (burst is not None and self.window_score < self.threshold
+                and self.current_time - burst['last'] > self.merge_gap):
+            return self._close()
+        return []
+
+    def flush(self):
+        """直播结束时输出尚未结束的高潮"""
+        return self._close()
+
+    def _span(self, burst):
+        # 超长高潮被截断后，紧接着的新片段会回溯 window_size + lookback 秒，不能与上一个片段重叠
+        start = max(self._last_end, int(burst['first'] - self.window_size) - self.lookback)
+        end = int(burst['last']) + self.lookback
+        return start, end
+
+    def _close(self):
+        burst, self._burst = self._burst, None
+        if burst is None:
+            return []
+        start, end = self._span(burst)
+        if end - start > self.max_duration:
+            end = start + self.max_duration
+        if end - start < self.min_duration:
+            return []
+        self._last_end = end
+        highlight = {'start': start, 'end': end, 'score': burst['score'], 'count': burst['count']}
+        if self.on_highlight:
+            self.on_highlight(highlight)
+        return [highlight]
+
+# ---------- 弹幕来源 ----------
+# 每个来源都是生成器：产出 (时间, 文本)，空闲时产出 None，便于调用方按墙钟推进时间
+
+def parse_live_line(line):
+    """解析一行实时弹幕：ASS Dialogue 行，或 "秒数<TAB>文本"；无法解析时返回 None"""
+    if 'Dialogue:' in line:
+        return parse_dialogue_line(line)
+    seconds, sep, text = line.rstrip('\r\n').partition('\t')
+    if not sep:
+        return None
+    try:
+        return float(seconds), text.strip()
+    except ValueError:
+        return None
+
+def _parsed(lines):
+    for line in lines:
+        if line is None:
+            yield None
+            continue
+        parsed = parse_live_line(line)
+        if parsed and parsed[1]:
+            yield parsed
+
+def tail_file(path, poll_interval=1.0, from_start=True):
+    """跟踪持续写入的弹幕文件（类似 tail -f），只处理完整的行"""
+    def lines():
+        with open(path, 'r', encoding='utf-8-sig') as f:
+            if not from_start:
+                f.seek(0, 2)
+            pending = ''
+            while True:
+                chunk = f.readline()
+                if not chunk:
+                    yield None
+                    time.sleep(poll_interval)
+                    continue
+                pending += chunk
+                if pending.endswith('\n'):
+                    yield pending
+                    pending = ''
+    return _parsed(lines())
+
+def read_stdin(idle_timeout=1.0):
+    """逐行读取标准输入；POSIX 下用 selectors 等待输入，空闲 idle_timeout 秒产出一次 None"""
+    selector = selectors.DefaultSelector()
+    try:
+        fd = sys.stdin.fileno()
+        selector.register(fd, selectors.EVENT_READ)
+    except (OSError, ValueError):
+        # Windows 或重定向自普通文件时无法 select，退回阻塞读取
+        selector.close()
+        return _parsed(sys.stdin)
+
+    def lines():
+        buffer = b''
+        with selector:
+            while True:
+                if not selector.select(idle_timeout):
+                    yield None
+                    continue
+                data = os.read(fd, 65536)
+                if not data:
+                    break
+                buffer += data
+                *complete, buffer = buffer.split(b'\n')
+                for raw in complete:
+                    yield raw.decode('utf-8', errors='ignore')
+        if buffer:
+            yield buffer.decode('utf-8', errors='ignore')
+    return _parsed(lines())
+
+def read_socket(host='127.0.0.1', port=9000, idle_timeout=1.0):
+    """监听本地 TCP 端口，逐行读取推送来的弹幕；连接断开后继续等待下一个连接"""
+    def lines():
+        with socket.create_server((host, port)) as server:
+            # 等待连接期间同样按 idle_timeout 产出 None，推送端在高潮中途断开时高潮也能按时结束
+            server.settimeout(idle_timeout)
+            print(f"📡 等待弹幕推送连接: {host}:{port}")
+            while True:
+                try:
+                    conn, addr = server.accept()
+                except socket.timeout:
+                    yield None
+                    continue
+                print(f"📡 已连接: {addr[0]}:{addr[1]}")
+                conn.settimeout(idle_timeout)
+                buffer = b''
+                with conn:
+                    while True:
+                        try:
+                            data = conn.recv(65536)
+                        except socket.timeout:
+                            yield None
+                            continue
+                        if not data:
+                            break
+                        buffer += data
+                        *complete, buffer = buffer.split(b'\n')
+                        for raw in complete:
+                            yield raw.decode('utf-8', errors='ignore')
+                print("📡 连接已断开")
+    return _parsed(lines())
+
+def replay_ass(path, speed=60.0):
+    """按弹幕原始时间间隔回放已录制的 .ass，speed 为倍速（0 = 不等待），用于测试实时模式"""
+    store = load_ass_danmaku(path)
+    previous = None
+    for t, text in zip(store.times, store.texts):
+        if speed and previous is not None and t > previous:
+            time.sleep((t - previous) / speed)
+        previous = t
+        yield t, text
+
+def run_detector(detector, source, realtime=True):
+    """
+    从来源读取弹幕送入检测器，直到来源结束；返回全部高光片段。
+    realtime 为 True 时，空闲期间按墙钟推算直播时间推进窗口，使高潮能在没有新弹幕时也按时结束。
+    """
+    highlights = []
+    last_time = None
+    last_wall = time.monotonic()
+    for item in source:
+        if item is None:
+            if realtime and last_time is not None:
+                highlights.extend(detector.advance(last_time + time.monotonic() - last_wall))
+            continue
+        t, text = item
+        last_time, last_wall = t, time.monotonic()
+        highlights.extend(detector.push(t, text))
+    highlights.extend(detector.flush())
+    return highlights
@@ -0,0 +1,113 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+LLM_CACHE_SUFFIX = ".json"
+LLM_CACHE_VERSION = 1
+
+def response_cache_key(model, temperature, prompt):
+    """由 (模型名, temperature, 完整提示词) 计算缓存键（SHA-256 十六进制）"""
+    payload = json.dumps(
+        [LLM_CACHE_VERSION, model, float(temperature), prompt],
+        ensure_ascii=False, separators=(',', ':')
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class ResponseCache:
+    """
+    LLM 回复的磁盘缓存：每条回复一个 <键>.json 文件，按内容寻址，提示词不变即命中。
+    命中时刷新文件修改时间，写入后按修改时间淘汰最久未用的条目，使总大小不超过 max_bytes、条数不超过 max_entries。
+    refresh 为 True 时忽略已有缓存（仍写入新结果）。线程安全。
+    """
+
+    def __init__(self, cache_dir, max_bytes=50 * 1024 * 1024, max_entries=2000, refresh=False):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.refresh = refresh
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + LLM_CACHE_SUFFIX)
+
+    def get(self, key):
+        """返回缓存的回复文本，未命中时返回 None"""
+        if self.refresh:
+            self._count(hit=False)
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            content = entry['response']
+        except (OSError, ValueError, KeyError, TypeError):
+            self._count(hit=False)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self._count(hit=True)
+        return content
+
+    def put(self, key, content, **meta):
+        """写入一条回复（先写临时文件再原子替换），meta 中的字段一并保存便于查看"""
+        entry = {'response': content, 'created_at': time.time(), **meta}
+        tmp_path = None
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, self._path(key))
+            tmp_path = None
+        except (OSError, TypeError, ValueError) as e:
+            print(f"⚠️ AI 回复缓存写入失败: {e}")
+            return
+        finally:
+            # 写入或替换失败时删除残留的临时文件（淘汰只统计 .json，不会清理 .tmp）
+            if tmp_path:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+        self._evict()
+
+    def _count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            total = 0
+            try:
+                with os.scandir(self.cache_dir) as it:
+                    for entry in it:
+                        if entry.name.endswith(LLM_CACHE_SUFFIX) and entry.is_file():
+                            stat = entry.stat()
+                            entries.append((stat.st_mtime, stat.st_size, entry.path))
+                            total += stat.st_size
+            except OSError:
+                return
+            if total <= self.max_bytes and len(entries) <= self.max_entries:
+                return
+            entries.sort()
+            remaining = len(entries)
+            for _, size, path in entries:
+                if total <= self.max_bytes and remaining <= self.max_entries:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+                remaining -= 1
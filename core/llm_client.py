@@ -0,0 +1,118 @@
+import json
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from core.http_retry import retry_delay
+
+# 限流与服务端临时错误，值得退避后重试
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+
+_CODE_FENCE_RE = re.compile(r'```(?:json)?\s*|\s*```')
+
+class ChatCompletionError(Exception):
+    def __init__(self, message, status_code=None):
+        super().__init__(message)
+        self.status_code = status_code
+
+class ChatCompletionClient:
+    """
+    OpenAI 兼容的 chat/completions 客户端：复用连接池，429/5xx 与网络错误按指数退避重试
+    （优先遵循服务端的 Retry-After）。线程安全，可在多个线程中同时调用 complete。
+    """
+
+    def __init__(self, base_url, api_key, model, timeout=60, max_retries=3, backoff=1.0, pool_size=8):
+        self.base_url = base_url
+        self.model = model
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.session = requests.Session()
+        self.session.headers.update({
+            'Authorization': f'Bearer {api_key}',
+            'Content-Type': 'application/json'
+        })
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _retry_delay(self, attempt, response=None):
+        return retry_delay(attempt, self.backoff, response)
+
+    def complete(self, prompt, temperature=0.7, max_tokens=600):
+        """发送单轮对话，返回回复文本；最终失败时抛出 ChatCompletionError"""
+        payload = {
+            'model': self.model,
+            'messages': [{'role': 'user', 'content': prompt}],
+            'temperature': temperature,
+            'max_tokens': max_tokens
+        }
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            try:
+                response = self.session.post(self.base_url, json=payload, timeout=self.timeout)
+            except requests.RequestException as e:
+                if last_attempt:
+                    raise ChatCompletionError(str(e)) from e
+                time.sleep(self._retry_delay(attempt))
+                continue
+
+            if response.status_code == 200:
+                try:
+                    return response.json()['choices'][0]['message']['content']
+                except (ValueError, KeyError, IndexError, TypeError) as e:
+                    raise ChatCompletionError(f"响应格式异常: {e}") from e
+            if response.status_code not in RETRY_STATUS_CODES or last_attempt:
+                raise ChatCompletionError(f"HTTP {response.status_code}", response.status_code)
+            time.sleep(self._retry_delay(attempt, response))
+
+    def close(self):
+        self.session.close()
+
+def map_concurrently(func, items, max_workers=4):
+    """
+    用线程池并发执行 func(item)，同时进行的调用不超过 max_workers 个；
+    按 items 的顺序逐个产出结果（可以边完成边处理）。max_workers 为 1 时顺序执行。
+    """
+    items = list(items)
+    max_workers = max(1, int(max_workers or 1))
+    if max_workers == 1 or len(items) <= 1:
+        for item in items:
+            yield func(item)
+        return
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        yield from executor.map(func, items)
+
+def parse_json_array(text):
+    """
+    从模型回复中解析 JSON 数组（允许 markdown 代码块包裹，或被包在一个对象里）。
+    整体无法解析时（如回复被 max_tokens 截断），逐个取出其中能完整解码的对象。
+    """
+    text = _CODE_FENCE_RE.sub('', text).strip()
+    try:
+        data = json.loads(text)
+    except ValueError:
+        data = None
+    if isinstance(data, list):
+        return data
+    if isinstance(data, dict):
+        for value in data.values():
+            if isinstance(value, list):
+                return value
+        return [data]
+
+    decoder = json.JSONDecoder()
+    items = []
+    pos = text.find('{')
+    while pos != -1:
+        try:
+            item, end = decoder.raw_decode(text, pos)
+        except ValueError:
+            pos = text.find('{', pos + 1)
+            continue
+        items.append(item)
+        pos = text.find('{', end)
+    return items
@@ -0,0 +1,123 @@
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+def describe_error(error):
+    """ffmpeg 失败时取 stderr 的最后一行，便于定位原因"""
+    if isinstance(error, subprocess.CalledProcessError) and error.stderr:
+        stderr = error.stderr
+        if isinstance(stderr, bytes):
+            stderr = stderr.decode('utf-8', errors='ignore')
+        lines = [line.strip() for line in stderr.splitlines() if line.strip()]
+        if lines:
+            return f"ffmpeg 退出码 {error.returncode}: {lines[-1]}"
+    return str(error)
+
+def plan_render_groups(plans, max_gap=10, max_span=600, max_outputs=8):
+    """
+    把时间上重叠或间隔不超过 max_gap 秒的片段归为一组，组内只解码一次源视频。
+    单组覆盖的源视频时长不超过 max_span 秒、输出不超过 max_outputs 个。
+    返回 [[plan, ...], ...]，组内按开始时间排序。
+    """
+    groups = []
+    group_end = 0
+    for plan in sorted(plans, key=lambda p: p['actual_start_sec']):
+        if groups:
+            group = groups[-1]
+            merged_end = max(group_end, plan['actual_end_sec'])
+            if (plan['actual_start_sec'] - group_end <= max_gap
+                    and merged_end - group[0]['actual_start_sec'] <= max_span
+                    and len(group) < max_outputs):
+                group.append(plan)
+                group_end = merged_end
+                continue
+        groups.append([plan])
+        group_end = plan['actual_end_sec']
+    return groups
+
+def render_clips(processor, clips, jobs=1, index_width=2):
+    """
+    渲染全部片段。jobs > 1 时使用线程池并发调用 ffmpeg（线程只负责等待子进程，
+    编码本身在各自的 ffmpeg 进程中进行），输出目录结构与 regen_clip.py 与逐个渲染完全一致。
+    开启 group_clips 时，相邻/重叠的片段合并为一次解码渲染。
+    返回按片段序号排列的 [(序号, 标题, 错误信息或 None)]。
+    """
+    render_config = processor.config.get('render', {})
+
+    def result_of(plan, error=None):
+        title = plan['clip_data'].get('title', '')
+        if error is None:
+            return plan['index'], title, None
+        message = describe_error(error)
+        print(f"❌ 处理片段 {plan['index']} 时出错: {message}")
+        return plan['index'], title, message
+
+    def finish(plan):
+        try:
+            processor.finish_clip(plan)
+        except Exception as e:
+            return result_of(plan, e)
+        return result_of(plan)
+
+    def render_one(plan):
+        try:
+            processor.render_clip(plan)
+        except Exception as e:
+            return result_of(plan, e)
+        return finish(plan)
+
+    def render_group(group):
+        if len(group) == 1:
+            return [render_one(group[0])]
+        try:
+            processor.render_group(group)
+        except Exception as e:
+            print(f"⚠️ 合并渲染失败，改为逐个渲染: {describe_error(e)}")
+            return [render_one(plan) for plan in group]
+        return [finish(plan) for plan in group]
+
+    results = []
+    plans = []
+    for i, clip in enumerate(clips, 1):
+        try:
+            plans.append(processor.prepare_clip(
+                i,
+                clip,
+                generate_cover=False,
+                index_width=index_width,
+                force_regen_ass=False
+            ))
+        except Exception as e:
+            print(f"❌ 处理片段 {i} 时出错: {e}")
+            results.append((i, clip.get('title', ''), str(e)))
+
+    if render_config.get('group_clips', False) and render_config.get('cut_mode', 'reencode') != 'smart_copy':
+        groups = plan_render_groups(
+            plans,
+            max_gap=render_config.get('group_max_gap', 10),
+            max_span=render_config.get('group_max_span', 600),
+            max_outputs=render_config.get('group_max_outputs', 8)
+        )
+        for group in groups:
+            if len(group) > 1:
+                indexes = ', '.join(str(p['index']) for p in group)
+                print(f"🧩 片段 [{indexes}] 合并为一次解码渲染")
+    else:
+        groups = [[plan] for plan in plans]
+
+    jobs = max(1, int(jobs or 1))
+    if jobs == 1 or len(groups) <= 1:
+        for group in groups:
+            results.extend(render_group(group))
+    else:
+        print(f"⚙️ 并发渲染: {min(jobs, len(groups))} 个任务同时进行")
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            for group_results in executor.map(render_group, groups):
+                results.extend(group_results)
+
+    return sorted(results, key=lambda r: r[0])
+
+def print_render_report(results):
+    failed = [r for r in results if r[2]]
+    print(f"\n📊 渲染结果: 成功 {len(results) - len(failed)} 个 | 失败 {len(failed)} 个")
+    for index, title, message in failed:
+        print(f"   ❌ [{index}] {title}: {message}")
@@ -0,0 +1,112 @@
+import os
+import shutil
+import subprocess
+import tempfile
+from pathlib import Path
+
+# 边界 GOP 重编码时沿用源视频的 profile / level / pix_fmt，尽量与直接复制的 GOP 保持一致。
+# 重编码得到的 SPS/PPS 仍不可能与源视频逐字节相同，因此各段都保留带内参数集（TS 中间文件在每个 IDR 前重复 SPS/PPS），
+# mp4 输出使用 avc3 标签，要求解码器以带内参数集为准，而不是只用文件头 avcC 中第一段的参数集
+X264_PROFILES = {
+    'baseline': 'baseline',
+    'constrained baseline': 'baseline',
+    'main': 'main',
+    'high': 'high',
+}
+
+def _run(cmd):
+    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+def select_copy_range(keyframes, start_sec, end_sec, min_copy_sec=1.0):
+    """选出完全落在剪辑范围内的 GOP 区间 (首个关键帧, 最后一个关键帧)，不足以复制时返回 None"""
+    inside = [(t, idx) for t, idx in keyframes if start_sec <= t <= end_sec]
+    if len(inside) < 2:
+        return None
+    first, last = inside[0], inside[-1]
+    if last[0] - first[0] < min_copy_sec:
+        return None
+    return first, last
+
+def smart_cut(video_path, start_sec, end_sec, output_path, stream_info, keyframes,
+              ass_file=None, threads=0):
+    """
+    关键帧感知的快速剪辑：中间完整的 GOP 直接复制，只重编码两端不完整的 GOP，再无损拼接；
+    音频整体转为 AAC。传入 ass_file 时作为软字幕轨封装（不烧录）。
+    无法进行复制剪辑时返回 False，由调用方回退到完整重编码。
+    """
+    if not stream_info or stream_info.get('codec_name') != 'h264':
+        return False
+    copy_range = select_copy_range(keyframes, start_sec, end_sec)
+    if not copy_range:
+        return False
+    (copy_start, copy_start_idx), (copy_end, copy_end_idx) = copy_range
+
+    fps = stream_info.get('fps') or 30.0
+    half_frame = 0.5 / fps
+    # ultrafast 会关闭 CABAC 与 B 帧，与 main/high 源视频的编码工具不一致，这里用 veryfast
+    encode_args = ['-c:v', 'libx264', '-preset', 'veryfast', '-crf', '23']
+    profile = X264_PROFILES.get(str(stream_info.get('profile') or '').lower())
+    if profile:
+        encode_args.extend(['-profile:v', profile])
+    level = stream_info.get('level')
+    if isinstance(level, int) and level > 0:
+        encode_args.extend(['-level:v', f"{level / 10:g}"])
+    if stream_info.get('pix_fmt'):
+        encode_args.extend(['-pix_fmt', stream_info['pix_fmt']])
+    if threads:
+        encode_args.extend(['-threads', str(threads)])
+
+    output_path = Path(output_path)
+    work_dir = Path(tempfile.mkdtemp(prefix='.smartcut_', dir=output_path.parent))
+    try:
+        pieces = []
+        if copy_start - start_sec > half_frame:
+            head = work_dir / 'head.ts'
+            _run([
+                'ffmpeg', '-ss', f"{start_sec:.6f}", '-i', video_path,
+                '-t', f"{copy_start - start_sec - half_frame:.6f}", '-an', '-sn',
+                *encode_args, '-y', str(head)
+            ])
+            pieces.append(head)
+
+        middle = work_dir / 'middle.ts'
+        # 复制模式下 -ss 会落到不晚于该时间的关键帧；ffprobe 输出的 6 位小数时间可能略小于关键帧的真实 PTS，
+        # 多加半帧保证落在目标关键帧上，而不是前一个 GOP
+        _run([
+            'ffmpeg', '-ss', f"{copy_start + half_frame:.6f}", '-i', video_path,
+            '-frames:v', str(copy_end_idx - copy_start_idx), '-an', '-sn',
+            '-c:v', 'copy', '-avoid_negative_ts', 'make_zero', '-y', str(middle)
+        ])
+        pieces.append(middle)
+
+        if end_sec - copy_end > half_frame:
+            tail = work_dir / 'tail.ts'
+            _run([
+                'ffmpeg', '-ss', f"{copy_end:.6f}", '-i', video_path,
+                '-t', f"{end_sec - copy_end:.6f}", '-an', '-sn',
+                *encode_args, '-y', str(tail)
+            ])
+            pieces.append(tail)
+
+        concat_list = work_dir / 'concat.txt'
+        with open(concat_list, 'w', encoding='utf-8') as f:
+            for piece in pieces:
+                f.write(f"file '{piece.as_posix()}'\n")
+
+        cmd = [
+            'ffmpeg', '-f', 'concat', '-safe', '0', '-i', str(concat_list),
+            '-ss', f"{start_sec:.6f}", '-t', f"{end_sec - start_sec:.6f}", '-i', video_path,
+        ]
+        if ass_file:
+            cmd.extend(['-i', str(ass_file)])
+        cmd.extend(['-map', '0:v:0', '-map', '1:a:0?', '-c:v', 'copy', '-c:a', 'aac', '-b:a', '192k'])
+        if output_path.suffix.lower() in ('.mp4', '.mov'):
+            cmd.extend(['-tag:v', 'avc3'])
+        if ass_file:
+            # 软字幕输出总是 .mkv（见 VideoProcessor._try_smart_cut）
+            cmd.extend(['-map', '2:s:0', '-c:s', 'ass'])
+        cmd.extend(['-y', str(output_path)])
+        _run(cmd)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return os.path.exists(output_path)
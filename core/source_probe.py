@@ -0,0 +1,268 @@
+import json
+import os
+import struct
+import subprocess
+import sys
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+
+SOURCE_PROBE_FILENAME = "_source_probe.json"
+KEYFRAME_INDEX_FILENAME = "_source_keyframes.bin"
+
+# 关键帧索引文件头：魔数 + 版本 + 关键帧数量，随后是 float64 时间数组与 int64 数据包序号数组（小端）
+KEYFRAME_INDEX_MAGIC = b'ASKF'
+KEYFRAME_INDEX_HEADER = struct.Struct('<4sII')
+KEYFRAME_INDEX_VERSION = 1
+
+def _parse_rate(rate):
+    try:
+        num, den = rate.split('/')
+        return float(num) / float(den) if float(den) else 0.0
+    except (AttributeError, ValueError):
+        return 0.0
+
+def _source_key(video_path):
+    stat = os.stat(video_path)
+    return {
+        "path": os.path.abspath(video_path),
+        "size": stat.st_size,
+        "mtime": int(stat.st_mtime),
+    }
+
+def _run_ffprobe(args):
+    result = subprocess.run(['ffprobe', '-v', 'error', *args], check=True, capture_output=True)
+    return result.stdout.decode('utf-8', errors='ignore')
+
+class SourceProbe:
+    """
+    源视频的探测结果：流信息、时长与关键帧索引。
+    以 (路径, 大小, 修改时间) 为键缓存在输出目录的 _source_probe.json 旁边，每个源视频只探测一次；
+    关键帧索引体积较大且需要完整扫描数据包，首次用到时才生成。
+    """
+
+    def __init__(self, info, cache_dir):
+        self.info = info
+        self.cache_dir = Path(cache_dir)
+        self._keyframe_times = None
+        self._keyframe_packets = None
+        self._keyframe_lock = threading.Lock()
+
+    @property
+    def key(self):
+        return self.info["key"]
+
+    @property
+    def video_path(self):
+        return self.key["path"]
+
+    @property
+    def duration(self):
+        return self.info.get("duration") or 0.0
+
+    @property
+    def start_time(self):
+        return self.info.get("start_time") or 0.0
+
+    @property
+    def video(self):
+        return self.info.get("video")
+
+    @property
+    def audio(self):
+        return self.info.get("audio")
+
+    @property
+    def has_audio(self):
+        return bool(self.info.get("audio"))
+
+    # ---------- 探测 ----------
+
+    @classmethod
+    def probe(cls, video_path, cache_dir):
+        data = json.loads(_run_ffprobe([
+            '-show_entries',
+            'format=duration,start_time,format_name'
+            ':stream=index,codec_type,codec_name,profile,level,pix_fmt,width,height,'
+            'avg_frame_rate,r_frame_rate,sample_rate,channels',
+            '-of', 'json', video_path
+        ]))
+        fmt = data.get('format', {})
+        streams = data.get('streams') or []
+        video = next((s for s in streams if s.get('codec_type') == 'video'), None)
+        audio = next((s for s in streams if s.get('codec_type') == 'audio'), None)
+
+        info = {
+            "key": _source_key(video_path),
+            "format_name": fmt.get('format_name'),
+            "duration": float(fmt.get('duration') or 0),
+            "start_time": float(fmt.get('start_time') or 0),
+            "streams": [
+                {"index": s.get('index'), "codec_type": s.get('codec_type'), "codec_name": s.get('codec_name')}
+                for s in streams
+            ],
+            "video": None,
+            "audio": None,
+        }
+        if video:
+            info["video"] = {
+                "codec_name": video.get('codec_name'),
+                "profile": video.get('profile'),
+                "level": video.get('level'),
+                "pix_fmt": video.get('pix_fmt'),
+                "width": video.get('width'),
+                "height": video.get('height'),
+                "fps": _parse_rate(video.get('avg_frame_rate')) or _parse_rate(video.get('r_frame_rate')),
+            }
+        if audio:
+            info["audio"] = {
+                "codec_name": audio.get('codec_name'),
+                "sample_rate": int(audio.get('sample_rate') or 0),
+                "channels": audio.get('channels'),
+            }
+        probe = cls(info, cache_dir)
+        probe.save()
+        return probe
+
+    def save(self):
+        try:
+            with open(self.cache_dir / SOURCE_PROBE_FILENAME, 'w', encoding='utf-8') as f:
+                json.dump(self.info, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            print(f"⚠️ 无法写入源视频探测缓存: {e}")
+
+    # ---------- 关键帧索引 ----------
+
+    def _load_keyframes(self):
+        index_path = self.cache_dir / KEYFRAME_INDEX_FILENAME
+        if not index_path.exists() or self.info.get("keyframe_count") is None:
+            return False
+        try:
+            with open(index_path, 'rb') as f:
+                magic, version, count = KEYFRAME_INDEX_HEADER.unpack(f.read(KEYFRAME_INDEX_HEADER.size))
+                if magic != KEYFRAME_INDEX_MAGIC or version != KEYFRAME_INDEX_VERSION:
+                    return False
+                if count != self.info["keyframe_count"]:
+                    return False
+                times = array('d')
+                packets = array('q')
+                times.fromfile(f, count)
+                packets.fromfile(f, count)
+        except (OSError, EOFError, struct.error):
+            return False
+        if sys.byteorder == 'big':
+            times.byteswap()
+            packets.byteswap()
+        self._keyframe_times = times
+        self._keyframe_packets = packets
+        return True
+
+    def _scan_keyframes(self):
+        print("🔍 正在建立关键帧索引（每个源视频只需一次）...")
+        output = _run_ffprobe([
+            '-select_streams', 'v:0', '-show_entries', 'packet=pts_time,flags',
+            '-of', 'csv=p=0', self.video_path
+        ])
+        times = array('d')
+        packets = array('q')
+        packet_index = 0
+        start_time = self.start_time
+        for line in output.splitlines():
+            pts, _, flags = line.strip().partition(',')
+            if not pts or pts == 'N/A':
+                continue
+            if 'K' in flags:
+                times.append(float(pts) - start_time)
+                packets.append(packet_index)
+            packet_index += 1
+
+        self._keyframe_times = times
+        self._keyframe_packets = packets
+        self.info["keyframe_count"] = len(times)
+        try:
+            disk_times = array('d', times)
+            disk_packets = array('q', packets)
+            if sys.byteorder == 'big':
+                disk_times.byteswap()
+                disk_packets.byteswap()
+            with open(self.cache_dir / KEYFRAME_INDEX_FILENAME, 'wb') as f:
+                f.write(KEYFRAME_INDEX_HEADER.pack(KEYFRAME_INDEX_MAGIC, KEYFRAME_INDEX_VERSION, len(times)))
+                disk_times.tofile(f)
+                disk_packets.tofile(f)
+        except OSError as e:
+            print(f"⚠️ 无法写入关键帧索引: {e}")
+        self.save()
+
+    def ensure_keyframes(self):
+        with self._keyframe_lock:
+            if self._keyframe_times is None and not self._load_keyframes():
+                try:
+                    self._scan_keyframes()
+                except (OSError, subprocess.CalledProcessError) as e:
+                    print(f"⚠️ 关键帧索引生成失败: {e}")
+                    self._keyframe_times = array('d')
+                    self._keyframe_packets = array('q')
+        return self._keyframe_times
+
+    def keyframes_between(self, start_sec, end_sec):
+        """返回 [start_sec, end_sec] 内的 [(关键帧时间, 数据包序号)]，时间轴与 ffmpeg -ss 一致"""
+        times = self.ensure_keyframes()
+        lo = bisect_left(times, start_sec)
+        hi = bisect_right(times, end_sec)
+        return list(zip(times[lo:hi], self._keyframe_packets[lo:hi]))
+
+    def snap_to_keyframe(self, seconds, direction='before'):
+        """把时间点对齐到前一个 (before) 或后一个 (after) 关键帧，找不到时原样返回"""
+        times = self.ensure_keyframes()
+        if direction == 'before':
+            i = bisect_right(times, seconds) - 1
+            return times[i] if i >= 0 else seconds
+        i = bisect_left(times, seconds)
+        return times[i] if i < len(times) else seconds
+
+    def clamp_range(self, start_sec, end_sec):
+        """
+        校验剪辑范围：开始时间超出视频时长时抛出 ValueError，结束时间超出时截断到视频末尾。
+        """
+        duration = self.duration
+        if not duration:
+            return start_sec, end_sec
+        if start_sec >= duration:
+            raise ValueError(
+                f"片段开始时间 {start_sec:.2f}s 超出视频时长 {duration:.2f}s，请检查时间戳"
+            )
+        return max(0.0, start_sec), min(end_sec, duration)
+
+def _load_cached_probe(video_path, start_dir):
+    key = _source_key(video_path)
+    current = Path(start_dir).resolve()
+    while True:
+        probe_path = current / SOURCE_PROBE_FILENAME
+        if probe_path.exists():
+            try:
+                with open(probe_path, 'r', encoding='utf-8') as f:
+                    info = json.load(f)
+                if info.get("key") == key:
+                    return SourceProbe(info, current)
+            except Exception:
+                pass
+        if current.parent == current:
+            return None
+        current = current.parent
+
+def get_source_probe(video_path, cache_dir):
+    """
+    读取源视频探测缓存：从 cache_dir 向上查找键一致的 _source_probe.json，
+    找不到或源视频已变化时重新探测并写入 cache_dir。ffprobe 不可用时返回 None。
+    """
+    if not video_path or not os.path.exists(video_path):
+        return None
+    cached = _load_cached_probe(video_path, cache_dir)
+    if cached:
+        return cached
+    try:
+        return SourceProbe.probe(video_path, cache_dir)
+    except (OSError, subprocess.CalledProcessError, ValueError) as e:
+        print(f"⚠️ 无法探测源视频信息（请确认已安装 ffprobe）: {e}")
+        return None
@@ -0,0 +1,176 @@
+import hashlib
+import os
+import re
+import struct
+import sys
+import tempfile
+from array import array
+
+# 解析结果缓存放在字幕文件旁的 .cache 目录，文件名为 <字幕文件名>.<内容哈希>.subs
+SUBTITLE_CACHE_DIRNAME = ".cache"
+SUBTITLE_CACHE_SUFFIX = ".subs"
+
+# 缓存文件头：魔数 + 版本 + 字幕条数，随后是 float64 开始/结束时间数组、uint32 文本字符数数组与拼接后的 UTF-8 文本（小端）
+SUBTITLE_CACHE_MAGIC = b'ASSB'
+SUBTITLE_CACHE_HEADER = struct.Struct('<4sII')
+SUBTITLE_CACHE_VERSION = 1
+
+_SRT_TIME_RE = re.compile(r'(\d+):(\d+):(\d+)[,\.](\d+)\s*-->\s*(\d+):(\d+):(\d+)[,\.](\d+)')
+
+class SubtitleTrack:
+    """
+    解析后的字幕：开始/结束时间为并列的 float64 数组，文本为字符串列表（多行文本以换行连接）。
+    """
+
+    __slots__ = ('starts', 'ends', 'texts')
+
+    def __init__(self, starts=None, ends=None, texts=None):
+        self.starts = starts if starts is not None else array('d')
+        self.ends = ends if ends is not None else array('d')
+        self.texts = texts if texts is not None else []
+
+    def __len__(self):
+        return len(self.texts)
+
+    def to_dicts(self):
+        return [
+            {'start': start, 'end': end, 'text': text}
+            for start, end, text in zip(self.starts, self.ends, self.texts)
+        ]
+
+def _time_from_groups(h, m, s, frac):
+    return int(h) * 3600 + int(m) * 60 + float(f"{s}.{frac}")
+
+def parse_srt_content(content):
+    """
+    单遍解析 SRT 文本：空行分隔字幕块，块内第二行为时间轴，其余行为文本。
+    """
+    track = SubtitleTrack()
+    starts, ends, texts = track.starts, track.ends, track.texts
+    block = []
+
+    def flush():
+        if len(block) >= 3:
+            match = _SRT_TIME_RE.search(block[1])
+            if match:
+                groups = match.groups()
+                starts.append(_time_from_groups(*groups[:4]))
+                ends.append(_time_from_groups(*groups[4:]))
+                texts.append('\n'.join(block[2:]).rstrip())
+        block.clear()
+
+    for line in content.replace('\r\n', '\n').replace('\r', '\n').split('\n'):
+        if line.strip():
+            block.append(line if block else line.strip())
+        elif block:
+            flush()
+    flush()
+    return track
+
+def _cache_path(srt_path, digest):
+    srt_path = os.path.abspath(srt_path)
+    return os.path.join(
+        os.path.dirname(srt_path), SUBTITLE_CACHE_DIRNAME,
+        f"{os.path.basename(srt_path)}.{digest}{SUBTITLE_CACHE_SUFFIX}"
+    )
+
+def _remove_stale_caches(cache_path):
+    """同一字幕文件只保留最新内容的缓存"""
+    cache_dir = os.path.dirname(cache_path)
+    srt_name = os.path.basename(cache_path).rsplit('.', 2)[0]
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if (path != cache_path and name.endswith(SUBTITLE_CACHE_SUFFIX)
+                and name.rsplit('.', 2)[0] == srt_name):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+def _read_cache(cache_path):
+    try:
+        with open(cache_path, 'rb') as f:
+            magic, version, count = SUBTITLE_CACHE_HEADER.unpack(f.read(SUBTITLE_CACHE_HEADER.size))
+            if magic != SUBTITLE_CACHE_MAGIC or version != SUBTITLE_CACHE_VERSION:
+                return None
+            starts = array('d')
+            ends = array('d')
+            lengths = array('I')
+            starts.fromfile(f, count)
+            ends.fromfile(f, count)
+            lengths.fromfile(f, count)
+            blob = f.read()
+    except (OSError, EOFError, struct.error):
+        return None
+    if sys.byteorder == 'big':
+        starts.byteswap()
+        ends.byteswap()
+        lengths.byteswap()
+    try:
+        joined = blob.decode('utf-8')
+    except UnicodeDecodeError:
+        return None
+    if sum(lengths) != len(joined):
+        return None
+
+    texts = []
+    offset = 0
+    for length in lengths:
+        texts.append(joined[offset:offset + length])
+        offset += length
+    return SubtitleTrack(starts, ends, texts)
+
+def _write_cache(cache_path, track):
+    starts = array('d', track.starts)
+    ends = array('d', track.ends)
+    lengths = array('I', (len(text) for text in track.texts))
+    if sys.byteorder == 'big':
+        starts.byteswap()
+        ends.byteswap()
+        lengths.byteswap()
+    cache_dir = os.path.dirname(cache_path)
+    tmp_path = None
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # 临时文件名唯一，多个进程（如同时运行的 regen_clip.py）写同一缓存时互不干扰
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(SUBTITLE_CACHE_HEADER.pack(SUBTITLE_CACHE_MAGIC, SUBTITLE_CACHE_VERSION, len(track.texts)))
+            starts.tofile(f)
+            ends.tofile(f)
+            lengths.tofile(f)
+            f.write(''.join(track.texts).encode('utf-8'))
+        os.replace(tmp_path, cache_path)
+        tmp_path = None
+        _remove_stale_caches(cache_path)
+    except (OSError, ValueError) as e:
+        print(f"⚠️ 无法写入字幕解析缓存: {e}")
+    finally:
+        # 写入或替换失败时删除残留的临时文件
+        if tmp_path:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+def load_srt(srt_path, use_cache=True):
+    """
+    读取并解析 SRT，返回 SubtitleTrack；文件不存在时返回空结果。
+    解析结果按文件内容哈希缓存，字幕内容不变时直接读取缓存，修改（如纠错）后自动重新解析。
+    """
+    if not srt_path or not os.path.exists(srt_path):
+        return SubtitleTrack()
+    with open(srt_path, 'rb') as f:
+        raw = f.read()
+
+    cache_path = None
+    if use_cache:
+        cache_path = _cache_path(srt_path, hashlib.sha1(raw).hexdigest())
+        cached = _read_cache(cache_path)
+        if cached is not None:
+            return cached
+
+    track = parse_srt_content(raw.decode('utf-8-sig'))
+    if cache_path:
+        _write_cache(cache_path, track)
+    return track
@@ -1,5 +1,65 @@
 import os
-import re
+from bisect import bisect_left, bisect_right
+
+from core.subtitle_cache import load_srt
+
+class SubtitleIndex:
+    """
+    按开始时间排序的字幕索引，支持二分查询。
+    starts 有序；ends 不一定有序（字幕可能互相重叠），另存 ends 的前缀最大值，
+    用来二分定位第一条结束时间晚于查询起点的字幕。
+    """
+
+    def __init__(self, subtitles):
+        self.subtitles = sorted(subtitles, key=lambda sub: sub['start'])
+        self.starts = [sub['start'] for sub in self.subtitles]
+        self.ends = [sub['end'] for sub in self.subtitles]
+        self._max_ends = []
+        running_max = float('-inf')
+        for end in self.ends:
+            running_max = max(running_max, end)
+            self._max_ends.append(running_max)
+
+    def __len__(self):
+        return len(self.subtitles)
+
+    def __iter__(self):
+        return iter(self.subtitles)
+
+    def __getitem__(self, index):
+        return self.subtitles[index]
+
+    def overlap_bounds(self, start, end):
+        """与 (start, end) 有重叠的第一条和最后一条字幕的下标，没有重叠时返回 None"""
+        first = bisect_right(self._max_ends, start)
+        stop = bisect_left(self.starts, end)
+        last = stop - 1
+        while last >= first and self.ends[last] <= start:
+            last -= 1
+        if last < first:
+            return None
+        return first, last
+
+    def overlapping(self, start, end):
+        """与 (start, end) 有重叠的全部字幕，按开始时间排列"""
+        bounds = self.overlap_bounds(start, end)
+        if not bounds:
+            return []
+        first, last = bounds
+        return [
+            self.subtitles[i] for i in range(first, last + 1)
+            if self.ends[i] > start
+        ]
+
+    def within(self, start, end):
+        """与闭区间 [start, end] 相交（开始时间 <= end 且结束时间 >= start）的全部字幕，按开始时间排列"""
+        first = bisect_left(self._max_ends, start)
+        stop = bisect_right(self.starts, end)
+        return [self.subtitles[i] for i in range(first, stop) if self.ends[i] >= start]
+
+    def expand_bounds(self, first, last, before=0, after=0):
+        """把下标区间 [first, last] 向前扩展 before 条、向后扩展 after 条，不超出字幕范围"""
+        return max(0, first - before), min(len(self.subtitles) - 1, last + after)
 
 class SubtitleUtils:
     def __init__(self, config):
@@ -33,47 +93,24 @@ class SubtitleUtils:
 
     @staticmethod
     def parse_srt(srt_path):
-        if not srt_path or not os.path.exists(srt_path):
-            return []
-        with open(srt_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        subs = []
-        for block in re.split(r'\n\n+', content.strip()):
-            lines = block.strip().split('\n')
-            if len(lines) >= 3:
-                time_match = re.search(
-                    r'(\d+:\d+:\d+[,\.]\d+)\s*-->\s*(\d+:\d+:\d+[,\.]\d+)',
-                    lines[1]
-                )
-                if time_match:
-                    start = SubtitleUtils.parse_srt_time(time_match.group(1))
-                    end = SubtitleUtils.parse_srt_time(time_match.group(2))
-                    text = '\n'.join(lines[2:])
-                    subs.append({'start': start, 'end': end, 'text': text})
-        return subs
+        return load_srt(srt_path).to_dicts()
 
     @staticmethod
     def get_expanded_time_range(subtitles, target_start, target_end, pre_count, post_count):
+        """subtitles 可以是字幕列表或 SubtitleIndex；多次查询时传入索引以免重复排序"""
         if not subtitles:
             return target_start, target_end
+        index = subtitles if isinstance(subtitles, SubtitleIndex) else SubtitleIndex(subtitles)
 
-        core_start_idx = -1
-        core_end_idx = -1
-        for i, sub in enumerate(subtitles):
-            if sub['end'] > target_start and sub['start'] < target_end:
-                if core_start_idx == -1:
-                    core_start_idx = i
-                core_end_idx = i
-
-        if core_start_idx == -1:
+        bounds = index.overlap_bounds(target_start, target_end)
+        if not bounds:
             print("   ⚠️ 警告: 该时间段内无匹配字幕,将使用原始时间戳。")
             return target_start, target_end
 
-        new_start_idx = max(0, core_start_idx - pre_count)
-        new_end_idx = min(len(subtitles) - 1, core_end_idx + post_count)
+        new_start_idx, new_end_idx = index.expand_bounds(*bounds, before=pre_count, after=post_count)
 
-        expanded_start = subtitles[new_start_idx]['start']
-        expanded_end = subtitles[new_end_idx]['end']
+        expanded_start = index.starts[new_start_idx]
+        expanded_end = index.ends[new_end_idx]
 
         final_start = min(expanded_start, target_start)
         final_end = max(expanded_end, target_end)
@@ -168,18 +205,18 @@ Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
         clip_duration = end_offset - start_offset
         valid_count = 0
 
-        for sub in subtitles:
-            if sub['end'] > start_offset and sub['start'] < end_offset:
-                rel_start = max(0, sub['start'] - start_offset)
-                rel_end = min(clip_duration, sub['end'] - start_offset)
-                start_str = SubtitleUtils.sec_to_ass_time(rel_start)
-                end_str = SubtitleUtils.sec_to_ass_time(rel_end)
-                
-                wrapped_text = SubtitleUtils.auto_wrap_text(sub['text'], max_len=max_char_len)
-                text = wrapped_text.replace('\n', '\\N')
-                
-                events.append(f"Dialogue: 0,{start_str},{end_str},Default,,0,0,0,,{text}")
-                valid_count += 1
+        index = subtitles if isinstance(subtitles, SubtitleIndex) else SubtitleIndex(subtitles)
+        for sub in index.overlapping(start_offset, end_offset):
+            rel_start = max(0, sub['start'] - start_offset)
+            rel_end = min(clip_duration, sub['end'] - start_offset)
+            start_str = SubtitleUtils.sec_to_ass_time(rel_start)
+            end_str = SubtitleUtils.sec_to_ass_time(rel_end)
+            
+            wrapped_text = SubtitleUtils.auto_wrap_text(sub['text'], max_len=max_char_len)
+            text = wrapped_text.replace('\n', '\\N')
+            
+            events.append(f"Dialogue: 0,{start_str},{end_str},Default,,0,0,0,,{text}")
+            valid_count += 1
         
         with open(output_path, 'w', encoding='utf-8-sig') as f:
             f.write(header + '\n'.join(events))
@@ -6,21 +6,26 @@ from pathlib import Path
 from core.cover_generator import CoverGenerator
 from core.file_utils import clean_output_dir, sanitize_filename
 from core.regen_script import write_regen_script
-from core.subtitle_utils import SubtitleUtils
+from core.render_pool import describe_error
+from core.smart_cut import smart_cut
+from core.source_probe import get_source_probe
+from core.subtitle_utils import SubtitleIndex, SubtitleUtils
 
 class VideoProcessor:
-    def __init__(self, config, input_dir=None):
+    def __init__(self, config, input_dir=None, source_probe=None):
         self.config = config
         self.base_dir = Path(config['output_dir'])
         self.base_dir.mkdir(exist_ok=True, parents=True)
+        self.source_probe = source_probe or get_source_probe(config.get('source_video'), self.base_dir)
         self.subtitle_utils = SubtitleUtils(config)
-        self.cover_generator = CoverGenerator(config)
-        self.all_subs = []
+        self.cover_generator = CoverGenerator(config, source_probe=self.source_probe)
+        self.all_subs = SubtitleIndex([])
         self.input_dir = input_dir or config.get('input_dir', '')
 
         srt_file = config.get('srt_file')
         if srt_file and os.path.exists(srt_file):
-            self.all_subs = SubtitleUtils.parse_srt(srt_file)
+            # 整场字幕只建一次索引，各片段的范围扩展与 .ass 生成都用二分查询
+            self.all_subs = SubtitleIndex(SubtitleUtils.parse_srt(srt_file))
         else:
             print("❌ 错误: 未找到 SRT 字幕文件!")
 
@@ -33,11 +38,36 @@ class VideoProcessor:
         index_width=2,
         force_regen_ass=False
     ):
+        plan = self.prepare_clip(
+            index,
+            clip_data,
+            output_dir_override=output_dir_override,
+            generate_cover=generate_cover,
+            index_width=index_width,
+            force_regen_ass=force_regen_ass
+        )
+        self.render_clip(plan)
+        self.finish_clip(plan)
+
+    def prepare_clip(
+        self,
+        index,
+        clip_data,
+        output_dir_override=None,
+        generate_cover=True,
+        index_width=2,
+        force_regen_ass=False
+    ):
+        """计算剪辑范围、准备输出目录与 .ass 字幕，返回后续渲染所需的片段计划"""
         time_range = clip_data['timestamp']
         start_str, end_str = time_range.split('-')
         
         original_start_sec = SubtitleUtils.parse_srt_time(start_str)
         original_end_sec = SubtitleUtils.parse_srt_time(end_str)
+        if self.source_probe:
+            original_start_sec, original_end_sec = self.source_probe.clamp_range(
+                original_start_sec, original_end_sec
+            )
 
         pre_sentences = self.config['padding']['pre_sentences']
         post_sentences = self.config['padding']['post_sentences']
@@ -45,6 +75,13 @@ class VideoProcessor:
         actual_start_sec, actual_end_sec = SubtitleUtils.get_expanded_time_range(
             self.all_subs, original_start_sec, original_end_sec, pre_sentences, post_sentences
         )
+        if self.source_probe:
+            actual_start_sec, actual_end_sec = self.source_probe.clamp_range(actual_start_sec, actual_end_sec)
+            render_config = self.config.get('render', {})
+            if (render_config.get('cut_mode', 'reencode') == 'smart_copy'
+                    and render_config.get('snap_to_keyframes', False)):
+                actual_start_sec = self.source_probe.snap_to_keyframe(actual_start_sec, 'before')
+                actual_end_sec = self.source_probe.snap_to_keyframe(actual_end_sec, 'after')
         actual_duration = actual_end_sec - actual_start_sec
 
         safe_title = sanitize_filename(clip_data.get('title', 'clip'))
@@ -96,9 +133,39 @@ class VideoProcessor:
             else:
                 print("   ⚠️ 无字幕源，跳过字幕生成")
 
+        return {
+            'index': index,
+            'clip_data': clip_data,
+            'original_start_sec': original_start_sec,
+            'original_end_sec': original_end_sec,
+            'actual_start_sec': actual_start_sec,
+            'actual_end_sec': actual_end_sec,
+            'output_video': output_video,
+            'output_cover': output_cover,
+            'ass_file': ass_file,
+            'regen_script': regen_script,
+            'has_subs': has_subs,
+            'generate_cover': generate_cover,
+        }
+
+    def _ass_filter(self, ass_file):
         ass_path = str(ass_file.absolute()).replace('\\', '/').replace(':', r'\:')
         current_dir = os.getcwd().replace('\\', '/').replace(':', r'\:')
-        
+        return f"ass='{ass_path}':fontsdir='{current_dir}'"
+
+    def render_clip(self, plan):
+        actual_start_sec = plan['actual_start_sec']
+        actual_end_sec = plan['actual_end_sec']
+        actual_duration = actual_end_sec - actual_start_sec
+        has_subs = plan['has_subs']
+        threads = self.config.get('render', {}).get('threads_per_job', 0)
+
+        if self._try_smart_cut(
+            actual_start_sec, actual_end_sec, plan['output_video'],
+            plan['ass_file'] if has_subs else None, threads
+        ):
+            return
+
         cmd = [
             'ffmpeg', 
             '-ss', str(actual_start_sec), 
@@ -107,14 +174,79 @@ class VideoProcessor:
             '-c:v', 'libx264', '-preset', 'ultrafast', '-crf', '23',
             '-c:a', 'libmp3lame', '-b:a', '192k'
         ]
-        
+
+        if threads:
+            cmd.extend(['-threads', str(threads)])
+
         if has_subs:
-            cmd.extend(['-vf', f"ass='{ass_path}':fontsdir='{current_dir}'"])
+            cmd.extend(['-vf', self._ass_filter(plan['ass_file'])])
             
-        cmd.extend(['-y', str(output_video)])
+        cmd.extend(['-y', str(plan['output_video'])])
 
         subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
-        
+
+    def render_group(self, plans):
+        """
+        一次解码渲染多个相邻/重叠的片段：源视频只读取并解码一遍，
+        再通过 split/trim/ass 分支输出到各片段各自的文件。
+        """
+        if len(plans) == 1:
+            self.render_clip(plans[0])
+            return
+
+        group_start = min(p['actual_start_sec'] for p in plans)
+        group_end = max(p['actual_end_sec'] for p in plans)
+        threads = self.config.get('render', {}).get('threads_per_job', 0)
+        count = len(plans)
+
+        has_audio = self.source_probe.has_audio if self.source_probe else True
+
+        video_labels = ''.join(f"[v{i}]" for i in range(count))
+        filters = [f"[0:v]split={count}{video_labels}"]
+        if has_audio:
+            audio_labels = ''.join(f"[a{i}]" for i in range(count))
+            filters.append(f"[0:a]asplit={count}{audio_labels}")
+        for i, plan in enumerate(plans):
+            rel_start = plan['actual_start_sec'] - group_start
+            rel_end = plan['actual_end_sec'] - group_start
+            video_chain = f"[v{i}]trim=start={rel_start:.6f}:end={rel_end:.6f},setpts=PTS-STARTPTS"
+            if plan['has_subs']:
+                video_chain += f",{self._ass_filter(plan['ass_file'])}"
+            filters.append(f"{video_chain}[vo{i}]")
+            if has_audio:
+                filters.append(
+                    f"[a{i}]atrim=start={rel_start:.6f}:end={rel_end:.6f},asetpts=PTS-STARTPTS[ao{i}]"
+                )
+
+        cmd = [
+            'ffmpeg',
+            '-ss', str(group_start),
+            '-t', str(group_end - group_start),
+            '-i', self.config['source_video'],
+            '-filter_complex', ';'.join(filters)
+        ]
+        for i, plan in enumerate(plans):
+            cmd.extend(['-map', f"[vo{i}]"])
+            if has_audio:
+                cmd.extend(['-map', f"[ao{i}]"])
+            cmd.extend([
+                '-c:v', 'libx264', '-preset', 'ultrafast', '-crf', '23',
+                '-c:a', 'libmp3lame', '-b:a', '192k'
+            ])
+            if threads:
+                cmd.extend(['-threads', str(threads)])
+            cmd.extend(['-y', str(plan['output_video'])])
+
+        subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+    def finish_clip(self, plan):
+        clip_data = plan['clip_data']
+        original_start_sec = plan['original_start_sec']
+        original_end_sec = plan['original_end_sec']
+        output_cover = plan['output_cover']
+        regen_script = plan['regen_script']
+        generate_cover = plan['generate_cover']
+
         if generate_cover:
             cover_config = self.config.get('cover')
             if not cover_config:
@@ -134,3 +266,34 @@ class VideoProcessor:
 
         if self.input_dir:
             write_regen_script(regen_script, clip_data, self.config)
+
+    def _try_smart_cut(self, start_sec, end_sec, output_video, ass_file, threads):
+        render_config = self.config.get('render', {})
+        if render_config.get('cut_mode', 'reencode') != 'smart_copy':
+            return False
+        if ass_file and not render_config.get('soft_subs', False):
+            print("   ⚠️ smart_copy 模式无法烧录字幕，回退为重新编码（可开启 soft_subs 使用软字幕）")
+            return False
+        stream_info = self.source_probe.video if self.source_probe else None
+        if not stream_info or stream_info.get('codec_name') != 'h264':
+            print("   ⚠️ 源视频不是 H.264 或无法读取编码信息，回退为重新编码")
+            return False
+
+        source_video = self.config['source_video']
+        keyframes = self.source_probe.keyframes_between(start_sec, end_sec)
+        if ass_file:
+            # mp4 无法保留 ASS 样式，软字幕统一封装为 mkv
+            output_video = output_video.with_suffix('.mkv')
+        try:
+            done = smart_cut(
+                source_video, start_sec, end_sec, output_video, stream_info, keyframes,
+                ass_file=ass_file, threads=threads
+            )
+        except subprocess.CalledProcessError as e:
+            print(f"   ⚠️ 快速剪辑失败，回退为重新编码: {describe_error(e)}")
+            return False
+        if not done:
+            print("   ⚠️ 片段内完整 GOP 不足，回退为重新编码")
+            return False
+        print(f"   ⚡ 关键帧快速剪辑完成{'（软字幕）' if ass_file else ''}: {output_video.name}")
+        return True
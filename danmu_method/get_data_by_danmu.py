@@ -2,8 +2,20 @@ import re
 import os
 import json
 import sys
-import requests
-from collections import defaultdict
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.danmaku_compress import compress_danmaku, estimate_tokens
+from core.danmaku_density import compute_density, descending_rank_value, pick_peaks
+from core.danmaku_store import DanmakuStore, load_ass_danmaku
+from core.danmaku_weights import WeightClassifier
+from core.live_highlights import (
+    LiveHighlightDetector, read_socket, read_stdin, replay_ass, run_detector, tail_file
+)
+from core.llm_cache import ResponseCache, response_cache_key
+from core.llm_client import ChatCompletionClient, ChatCompletionError, map_concurrently, parse_json_array
+from core.subtitle_cache import load_srt
+from core.subtitle_utils import SubtitleIndex
 
 # ==============================================================================
 # [配置区域]
@@ -27,6 +39,20 @@ class ApiConfig:
     BASE_URL = "https://api.siliconflow.cn/v1/chat/completions" # 硅基流动请求地址
     MODEL_NAME = "deepseek-ai/DeepSeek-V3.2"  # 模型名称
     TIMEOUT = 60    # 请求超时时间
+    MAX_WORKERS = 4     # 同时进行的请求数量（1 = 逐个请求；遇到频繁限流可调小）
+    MAX_RETRIES = 3     # 遇到限流 (429) 或服务端错误 (5xx) 时的重试次数，按指数退避等待
+
+    # AI 回复缓存：模型、temperature 与提示词都不变时直接复用上次的回复，不再请求
+    CACHE_ENABLED = True
+    CACHE_REFRESH = False   # True = 忽略已有缓存重新请求（结果仍会写入缓存）
+    CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'llm_responses')
+    CACHE_MAX_MB = 50       # 缓存总大小上限，超出后删除最久未使用的回复
+    CACHE_MAX_ENTRIES = 2000
+    TEMPERATURE = 0.7
+
+    # 批量模式：把多个片段合并为一次请求，要求模型按片段编号返回 JSON 数组，解析失败的片段再单独请求
+    BATCH_SIZE = 5              # 每次请求最多包含的片段数（1 = 每个片段单独请求，模型难以稳定输出 JSON 数组时可改回 1）
+    BATCH_TOKEN_BUDGET = 6000   # 每次请求中片段上下文的估算 token 上限
 
 # 成员出场状态
 MEMBER_STATUS = {
@@ -43,8 +69,25 @@ class AnalyzeConfig:
     WINDOW_SIZE = 10        # 密度计算的时间窗口(秒)，表示计算每多少秒内的热度（推荐填写10）
     MIN_DENSITY = 5         # 最小热度阈值（推荐填写5）
     MERGE_THRESHOLD = 10    # 合并间隔
+    NMS_RADIUS = 5          # 峰值抑制半径(秒)，该范围内只保留热度最高的一个窗口，避免同一波高潮的相邻秒数挤占名额（0 = 不抑制，与旧版结果一致）
     MIN_DURATION = 10       # 最小保留时长
     MAX_DURATION = 90       # 最大保留时长
+    DANMAKU_TOKEN_BUDGET = 300  # 每个片段写入提示词的弹幕上限（估算 token 数），同类弹幕合并为 "文本 ×次数"
+
+class LiveConfig:
+    # 实时模式：直播进行中就分析弹幕，每段高潮结束后立即输出高光候选，不必等录播文件完成
+    # None       = 关闭，分析 FileConfig.INPUT_DIR 下完整的 .ass 文件（默认）
+    # "tail"     = 跟踪录播姬正在写入的 .ass 弹幕文件（FILE）
+    # "stdin"    = 从标准输入逐行读取（ASS Dialogue 行，或 "秒数<TAB>弹幕" 格式）
+    # "socket"   = 监听本地端口（HOST:PORT），读取推送过来的弹幕行，格式同上
+    # "replay"   = 按原始时间回放已录制的 .ass 文件（FILE），用于测试
+    SOURCE = None
+    FILE = r""
+    HOST = "127.0.0.1"
+    PORT = 9000
+    REPLAY_SPEED = 60       # 回放倍速（0 = 不等待，尽快回放）
+    THRESHOLD = 30          # 窗口热度达到该值视为进入高潮（实时模式没有全场统计，需按直播热度调整）
+    OUTPUT_FILE = 'live_highlights.jsonl'   # 每个高光候选追加一行 JSON
 
 # 弹幕权重
 DANMAKU_WEIGHTS = [
@@ -88,6 +131,49 @@ JSON 字段生成策略：
 }}
 """
 
+# 批量 Prompt 模板：{segments} 由多个 BATCH_SEGMENT_TEMPLATE 拼接而成
+BATCH_PROMPT_TEMPLATE = """
+你是一位非常熟悉虚拟女团 A-SOUL（成员是嘉然、贝拉、乃琳）的资深剪辑UP主。现在需要基于同一场{broadcast_type}中的 {count} 个高能片段，分别生成直播精彩片段的元数据。
+
+### 视频信息
+- 直播类型: {broadcast_type}
+- 出场成员: {active_members}
+- 原始文件: {filename}
+
+{segments}
+### 任务要求
+请逐个分析上面的片段，**只输出一个纯净的 JSON 数组**，不要包含 markdown 标记或任何解释性文字。
+每个片段对应数组中的一个对象，用 index 字段标明片段编号（即"片段 N"中的 N），不要遗漏或合并片段。
+
+JSON 字段生成策略：
+1. **title**: 标题可以用夸张吸引眼球的词汇，如'震惊!'、'绷不住了!'、'笑死!'、'名场面!'、'破防了!'等开头吸引点击。
+2. **cover_text_1**: 封面视觉核心，提炼最强冲突点，限制 **3-10个字** (如：嘉然身高被嘲)。
+3. **cover_text_2**: 封面辅助吐槽，对主字的补充或反转，限制 **3-10个字** (如：乃琳当场笑疯)。
+
+### JSON 输出格式
+[
+  {{
+    "index": 片段编号(整数),
+    "title": "B站风格吸睛标题，可以使用**情绪/玩梗前缀+具体事件**的二段式标题。",
+    "summary": "用粉丝视角的口吻，生动概括这个片段发生了什么（1-2句）",
+    "cover_text_1": "封面核心大字(3-10字)",
+    "cover_text_2": "封面补充小字(3-10字)",
+    "highlight_reason": "说明为什么这是高光片段，观众为何有这样的弹幕反应。如果涉及有趣的梗，请标注出来"
+  }}
+]
+"""
+
+BATCH_SEGMENT_TEMPLATE = """### 片段 {index}
+#### 字幕内容 (成员发言或对话)
+{subtitle_text}
+
+#### 弹幕反应 (观众情绪或反应)
+{danmaku_text}
+"""
+
+# AI 返回的每个片段必须包含的字段
+SUMMARY_FIELDS = ('title', 'summary', 'cover_text_1', 'cover_text_2', 'highlight_reason')
+
 # ==============================================================================
 # [核心逻辑]
 # ==============================================================================
@@ -100,8 +186,18 @@ class DanmakuAnalyzer:
         self.srt_file = None
         
         # 数据容器
-        self.danmaku_data = []
+        self.danmaku_data = DanmakuStore()
         self.subtitle_data = []
+        self.subtitle_index = SubtitleIndex([])
+        self.weight_classifier = WeightClassifier(DANMAKU_WEIGHTS, LONG_TEXT_BONUS)
+        self.llm_client = ChatCompletionClient(
+            ApiConfig.BASE_URL, ApiConfig.API_KEY, ApiConfig.MODEL_NAME,
+            timeout=ApiConfig.TIMEOUT, max_retries=ApiConfig.MAX_RETRIES, pool_size=ApiConfig.MAX_WORKERS
+        )
+        self.response_cache = ResponseCache(
+            ApiConfig.CACHE_DIR, max_bytes=ApiConfig.CACHE_MAX_MB * 1024 * 1024,
+            max_entries=ApiConfig.CACHE_MAX_ENTRIES, refresh=ApiConfig.CACHE_REFRESH
+        ) if ApiConfig.CACHE_ENABLED else None
         
         # 执行检测
         self._auto_detect_files()
@@ -145,52 +241,15 @@ class DanmakuAnalyzer:
         print(f"✅ 已锁定字幕文件: {srt_files[0]}")
         print("-" * 50)
 
-    def parse_ass_time(self, time_str):
-        try:
-            parts = time_str.split(':')
-            if len(parts) != 3:
-                raise ValueError("格式不是 H:M:S")
-            return int(parts[0]) * 3600 + int(parts[1]) * 60 + float(parts[2])
-        except Exception:
-            return 0
-    
-    def parse_srt_time(self, time_str):
-        try:
-            time_str = time_str.replace(',', '.')
-            parts = time_str.split(':')
-            if len(parts) != 3:
-                raise ValueError("格式不是 H:M:S")
-            return int(parts[0]) * 3600 + int(parts[1]) * 60 + float(parts[2])
-        except Exception:
-            return 0
-    
     def load_danmaku(self):
         if not os.path.exists(self.ass_file):
             print(f"错误: 找不到文件 {self.ass_file}")
             return []
         try:
-            with open(self.ass_file, 'r', encoding='utf-8-sig') as f:
-                content = f.read()
+            load_ass_danmaku(self.ass_file, self.danmaku_data)
         except Exception:
             return []
-        
-        pattern = r'Dialogue:\s*(\d+),(\d+:\d+:\d+\.\d+),(\d+:\d+:\d+\.\d+),([^,]*),([^,]*),([^,]*),([^,]*),([^,]*),([^,]*),(.*)'
-        matches = re.findall(pattern, content)
-        count = 0
-        
-        for match in matches:
-            try:
-                start_time = self.parse_ass_time(match[1])
-                raw_text = match[9]
-                clean_text = re.sub(r'\{[^}]*\}', '', raw_text).strip()
-                clean_text = re.sub(r'[\x00-\x1f\x7f-\x9f]', '', clean_text)
-                if clean_text and start_time > 0:
-                    self.danmaku_data.append({'time': start_time, 'text': clean_text})
-                    count += 1
-            except Exception:
-                continue
-        self.danmaku_data.sort(key=lambda x: x['time'])
-        print(f"✓ 成功加载 {count} 条弹幕")
+        print(f"✓ 成功加载 {len(self.danmaku_data)} 条弹幕")
         return self.danmaku_data
     
     def load_subtitles(self):
@@ -198,103 +257,74 @@ class DanmakuAnalyzer:
             print(f"错误: 找不到文件 {self.srt_file}")
             return []
         try:
-            with open(self.srt_file, 'r', encoding='utf-8-sig') as f:
-                content = f.read()
+            track = load_srt(self.srt_file)
         except Exception:
             return []
         
-        blocks = content.strip().split('\n\n')
-        count = 0
-        for block in blocks:
-            try:
-                lines = block.strip().split('\n')
-                if len(lines) >= 3:
-                    time_match = re.match(r'(\d+:\d+:\d+,\d+)\s*-->\s*(\d+:\d+:\d+,\d+)', lines[1])
-                    if time_match:
-                        self.subtitle_data.append({
-                            'start': self.parse_srt_time(time_match.group(1)),
-                            'end': self.parse_srt_time(time_match.group(2)),
-                            'text': ' '.join(lines[2:]).strip()
-                        })
-                        count += 1
-            except Exception:
-                continue
-        print(f"✓ 成功加载 {count} 条字幕")
+        for start, end, text in zip(track.starts, track.ends, track.texts):
+            self.subtitle_data.append({
+                'start': start,
+                'end': end,
+                'text': text.replace('\n', ' ').strip()
+            })
+        self.subtitle_index = SubtitleIndex(self.subtitle_data)
+        print(f"✓ 成功加载 {len(track)} 条字幕")
         return self.subtitle_data
     
     def get_danmaku_weight(self, text):
-        weight = 1.0
-        for pattern, score in DANMAKU_WEIGHTS:
-            if re.search(pattern, text, re.IGNORECASE):
-                weight = max(weight, score)
-        limit, bonus = LONG_TEXT_BONUS
-        if len(text) >= limit:
-            weight = max(weight, bonus)
-        return weight
-
-    def calculate_density(self):
-        if not self.danmaku_data: return {}, {}
-        raw_score = defaultdict(float)
-        raw_count = defaultdict(int)
-        for danmaku in self.danmaku_data:
-            t = int(danmaku['time'])
-            weight = self.get_danmaku_weight(danmaku['text'])
-            raw_score[t] += weight
-            raw_count[t] += 1
-            
-        if not raw_score: return {}, {}
-        max_time = max(raw_score.keys())
-        min_time = min(raw_score.keys())
-        window_size = AnalyzeConfig.WINDOW_SIZE
-        score_map = {}
-        count_map = {}
-        for t in range(min_time, max_time + 1):
-            curr_score = 0
-            curr_count = 0
-            for i in range(window_size):
-                if (t + i) in raw_score:
-                    curr_score += raw_score[t + i]
-                    curr_count += raw_count[t + i]
-            if curr_score > 0:
-                score_map[t] = curr_score
-                count_map[t] = curr_count
-        
-        print(f"✓ 计算密度: 窗口大小={window_size}秒, 有效时间点={len(score_map)}")
-        return score_map, count_map
+        return self.weight_classifier.weight(text)
+
+    def calculate_density(self, window_sizes=None):
+        """
+        计算逐秒的窗口密度，返回 DanmakuDensity（稠密数组，可同时包含多个窗口大小），没有弹幕时返回 None。
+        默认只计算 AnalyzeConfig.WINDOW_SIZE。
+        """
+        if not self.danmaku_data: return None
+        window_sizes = window_sizes or [AnalyzeConfig.WINDOW_SIZE]
+        weights = self.weight_classifier.weights(self.danmaku_data.texts)
+        density = compute_density(self.danmaku_data.times, weights, window_sizes)
+
+        valid = int(np.count_nonzero(density.score(window_sizes[0]) > 0))
+        print(f"✓ 计算密度: 窗口大小={window_sizes[0]}秒, 有效时间点={valid}")
+        return density
 
     def find_highlights(self):
-        score_map, count_map = self.calculate_density()
-        if not score_map: return []
-            
-        all_scores = sorted(score_map.values(), reverse=True)
-        if not all_scores: return []
+        density = self.calculate_density()
+        if density is None: return []
+        scores = density.score(AnalyzeConfig.WINDOW_SIZE)
+        counts = density.count(AnalyzeConfig.WINDOW_SIZE)
+
+        positive = scores[scores > 0]
+        if not positive.size: return []
 
-        p90 = all_scores[int(len(all_scores) * 0.1)]
+        p90 = float(descending_rank_value(positive, 0.1))
         target_min = AnalyzeConfig.MIN_DENSITY
         adaptive_min = p90 if target_min > p90 else target_min
         
         # === 详细输出：高分窗口 ===
-        high_score_windows = [(t, s) for t, s in score_map.items() if s >= adaptive_min]
-        high_score_windows.sort(key=lambda x: x[1], reverse=True)
+        # 只保留局部峰值，按热度降序（热度相同按时间先后）取前 TOP_N * 5 个
+        top_limit = AnalyzeConfig.TOP_N * 5
+        window_count = int(np.count_nonzero(positive >= adaptive_min))
+        peaks = pick_peaks(scores, adaptive_min, AnalyzeConfig.NMS_RADIUS, top_limit)
+        high_score_windows = [(density.origin + int(i), float(scores[i])) for i in peaks]
         
-        print(f"\n找到 {len(high_score_windows)} 个高分时间窗口 (阈值: {adaptive_min:.1f})")
+        print(f"\n找到 {window_count} 个高分时间窗口 (阈值: {adaptive_min:.1f})，保留 {len(high_score_windows)} 个峰值")
         print("前20个高分窗口:")
         for i, (t, s) in enumerate(high_score_windows[:20], 1):
-            print(f"  {i}. {self.format_time(t)} - 热度:{s:.1f} - 弹幕数:{count_map.get(t,0)}")
+            print(f"  {i}. {self.format_time(t)} - 热度:{s:.1f} - 弹幕数:{counts[t - density.origin]}")
 
         if not high_score_windows: return []
 
         # 合并逻辑
         raw_highlights = []
-        top_limit = AnalyzeConfig.TOP_N * 5
         lookback = 5
         
-        for start_time, score in high_score_windows[:top_limit]:
+        for start_time, score in high_score_windows:
             raw_highlights.append({
                 'start': max(0, start_time - lookback),
                 'end': start_time + AnalyzeConfig.WINDOW_SIZE + lookback,
                 'score': score,
-                'count': count_map.get(start_time, 0)
+                'count': int(counts[start_time - density.origin])
             })
         raw_highlights.sort(key=lambda x: x['start'])
         
@@ -334,15 +364,21 @@ class DanmakuAnalyzer:
         
         return final_highlights
 
-    def generate_summary_with_ai(self, highlight):
+    def build_context(self, highlight):
+        """返回片段的 (字幕文本, 弹幕文本)"""
         start, end = highlight['start'], highlight['end']
-        # 弹幕往前回溯5秒，往后延迟5秒，获取更完整的信息，最多保留50条不重复的弹幕
-        danmaku_context = [d['text'] for d in self.danmaku_data if start-5 <= d['time'] <= end+5]    
-        danmaku_text = '\n'.join([f"- {t}" for t in list(set(danmaku_context))[:50]]) or "(无弹幕)"
+        # 弹幕往前回溯5秒，往后延迟5秒，获取更完整的信息
+        # 弹幕已按时间排序，二分定位窗口；近似重复的弹幕合并计数，按次数从多到少在 token 预算内保留
+        lo, hi = self.danmaku_data.range_indices(start-5, end+5)
+        danmaku_context = compress_danmaku(self.danmaku_data.texts[lo:hi], AnalyzeConfig.DANMAKU_TOKEN_BUDGET)
+        danmaku_text = '\n'.join([f"- {t}" for t in danmaku_context]) or "(无弹幕)"
         # 字幕往前回溯25秒，往后延迟5秒，获取更完整的信息
-        sub_context = [s for s in self.subtitle_data if s['start'] <= end+5 and s['end'] >= start-25] 
+        sub_context = self.subtitle_index.within(start-25, end+5)
         sub_text = '\n'.join([f"{self.format_time(s['start'])}: {s['text']}" for s in sub_context]) or "(无字幕)"
-        
+        return sub_text, danmaku_text
+
+    def broadcast_info(self):
+        """返回 (直播类型描述, 出场成员列表)"""
         active_members = [k for k, v in MEMBER_STATUS.items() if v == 1]
         
         if len(active_members) == 1:
@@ -351,6 +387,11 @@ class DanmakuAnalyzer:
             broadcast_desc = "A-SOUL团播"
         else:
             broadcast_desc = "A-SOUL直播"
+        return broadcast_desc, active_members
+
+    def build_prompt(self, highlight, context=None):
+        sub_text, danmaku_text = context or self.build_context(highlight)
+        broadcast_desc, active_members = self.broadcast_info()
         
         prompt = PROMPT_TEMPLATE.format(
             broadcast_type=broadcast_desc,
@@ -359,35 +400,149 @@ class DanmakuAnalyzer:
             subtitle_text=sub_text,
             danmaku_text=danmaku_text
         )
+        return prompt
+
+    def build_batch_prompt(self, jobs):
+        broadcast_desc, active_members = self.broadcast_info()
+        segments = '\n'.join(job['section'] for job in jobs)
+        return BATCH_PROMPT_TEMPLATE.format(
+            broadcast_type=broadcast_desc,
+            count=len(jobs),
+            active_members=', '.join(active_members),
+            filename=os.path.basename(self.srt_file),
+            segments=segments
+        )
+
+    def _summary_result(self, highlight, result_json):
+        time_str = f"{self.format_time(highlight['start'])}-{self.format_time(highlight['end'])}"
+        return {
+            "timestamp": time_str,
+            **result_json,
+        }
+
+    def generate_summary_with_ai(self, highlight):
+        prompt = self.build_prompt(highlight)
+
+        cache_key = response_cache_key(ApiConfig.MODEL_NAME, ApiConfig.TEMPERATURE, prompt)
+        ai_content = self.response_cache.get(cache_key) if self.response_cache else None
+        from_cache = ai_content is not None
 
         try:
-            response = requests.post(
-                ApiConfig.BASE_URL,
-                headers={'Authorization': f'Bearer {ApiConfig.API_KEY}', 'Content-Type': 'application/json'},
-                json={
-                    'model': ApiConfig.MODEL_NAME,
-                    'messages': [{'role': 'user', 'content': prompt}],
-                    'temperature': 0.7,
-                    'max_tokens': 600
-                },
-                timeout=ApiConfig.TIMEOUT
-            )
-            
-            if response.status_code == 200:
-                ai_content = response.json()['choices'][0]['message']['content']
-                clean_json = re.sub(r'```json\s*|\s*```', '', ai_content).strip()
-                result_json = json.loads(clean_json)
-                time_str = f"{self.format_time(start)}-{self.format_time(end)}"
-                result_json = {
-                    "timestamp": time_str,
-                    **result_json,
-                }
-                return result_json
-            else:
-                return {"title": f"AI错误 {response.status_code}"}
+            if not from_cache:
+                ai_content = self.llm_client.complete(prompt, temperature=ApiConfig.TEMPERATURE, max_tokens=600)
+            clean_json = re.sub(r'```json\s*|\s*```', '', ai_content).strip()
+            result_json = json.loads(clean_json)
+            # 只缓存能解析的回复，格式错误的回复下次重新请求
+            if self.response_cache and not from_cache:
+                self.response_cache.put(cache_key, ai_content, model=ApiConfig.MODEL_NAME)
+            return self._summary_result(highlight, result_json)
+        except ChatCompletionError as e:
+            if e.status_code:
+                return {"title": f"AI错误 {e.status_code}"}
+            return {"title": "AI生成失败"}
         except Exception:
             return {"title": "AI生成失败"}
 
+    def plan_batches(self, highlights):
+        """
+        把片段按顺序切分为批次：每批最多 BATCH_SIZE 个需要请求的片段，上下文估算 token 不超过 BATCH_TOKEN_BUDGET。
+        已有缓存的片段不占用批次名额。
+        """
+        batches = []
+        current, pending, used = [], 0, 0
+        for index, highlight in enumerate(highlights, 1):
+            context = self.build_context(highlight)
+            prompt = self.build_prompt(highlight, context)
+            cache_key = response_cache_key(ApiConfig.MODEL_NAME, ApiConfig.TEMPERATURE, prompt)
+            cached = self.response_cache.get(cache_key) if self.response_cache else None
+            section = BATCH_SEGMENT_TEMPLATE.format(
+                index=index, subtitle_text=context[0], danmaku_text=context[1]
+            )
+            cost = 0 if cached is not None else estimate_tokens(section)
+            if cost and pending and (pending >= ApiConfig.BATCH_SIZE or used + cost > ApiConfig.BATCH_TOKEN_BUDGET):
+                batches.append(current)
+                current, pending, used = [], 0, 0
+            current.append({
+                'index': index, 'highlight': highlight, 'section': section,
+                'cache_key': cache_key, 'cached': cached
+            })
+            if cost:
+                pending += 1
+                used += cost
+        if current:
+            batches.append(current)
+        return batches
+
+    def _valid_batch_items(self, items, expected):
+        """按片段编号取出字段齐全的结果，编号不在本批内或字段缺失的条目丢弃"""
+        valid = {}
+        for item in items:
+            if not isinstance(item, dict):
+                continue
+            index = item.get('index')
+            if isinstance(index, str) and index.strip().isdigit():
+                index = int(index)
+            if not isinstance(index, int) or index not in expected or index in valid:
+                continue
+            if all(isinstance(item.get(k), str) and item[k].strip() for k in SUMMARY_FIELDS):
+                valid[index] = {k: item[k] for k in SUMMARY_FIELDS}
+        return valid
+
+    def generate_batch_summaries(self, jobs):
+        """一次请求生成一批片段的总结，返回按片段顺序排列的结果；批量结果中缺失或无效的片段单独重试"""
+        results = {}
+        pending = []
+        for job in jobs:
+            if job['cached'] is not None:
+                try:
+                    clean_json = re.sub(r'```json\s*|\s*```', '', job['cached']).strip()
+                    results[job['index']] = self._summary_result(job['highlight'], json.loads(clean_json))
+                    continue
+                except ValueError:
+                    pass
+            pending.append(job)
+
+        if len(pending) == 1:
+            job = pending[0]
+            results[job['index']] = self.generate_summary_with_ai(job['highlight'])
+        elif pending:
+            prompt = self.build_batch_prompt(pending)
+            try:
+                ai_content = self.llm_client.complete(
+                    prompt, temperature=ApiConfig.TEMPERATURE, max_tokens=600 * len(pending)
+                )
+                items = self._valid_batch_items(parse_json_array(ai_content), {job['index'] for job in pending})
+            except (ChatCompletionError, TypeError, ValueError) as e:
+                # 请求失败或回复为空 / 格式不对时，整批退回逐个单独请求
+                print(f"⚠️ 批量请求失败，{len(pending)} 个片段改为单独请求: {e}")
+                items = {}
+
+            for job in pending:
+                item = items.get(job['index'])
+                if item is None:
+                    print(f"⚠️ 片段{job['index']} 的批量结果无效，单独重试")
+                    results[job['index']] = self.generate_summary_with_ai(job['highlight'])
+                    continue
+                # 按单独请求的提示词写入缓存，之后无论是否批量都能命中
+                if self.response_cache:
+                    self.response_cache.put(
+                        job['cache_key'], json.dumps(item, ensure_ascii=False), model=ApiConfig.MODEL_NAME
+                    )
+                results[job['index']] = self._summary_result(job['highlight'], item)
+        return [results[job['index']] for job in jobs]
+
+    def summarize_highlights(self, highlights):
+        """按片段顺序逐个产出 AI 总结；BATCH_SIZE > 1 时把多个片段合并为一次请求"""
+        if ApiConfig.BATCH_SIZE <= 1:
+            yield from map_concurrently(self.generate_summary_with_ai, highlights, ApiConfig.MAX_WORKERS)
+            return
+        batches = self.plan_batches(highlights)
+        pending = [sum(job['cached'] is None for job in batch) for batch in batches]
+        if any(pending):
+            print(f"🧺 批量模式: {sum(pending)} 个待请求片段合并为 {sum(1 for n in pending if n)} 个请求")
+        for batch_results in map_concurrently(self.generate_batch_summaries, batches, ApiConfig.MAX_WORKERS):
+            yield from batch_results
+
     def format_time(self, seconds):
         h = int(seconds // 3600)
         m = int((seconds % 3600) // 60)
@@ -419,11 +574,12 @@ class DanmakuAnalyzer:
         print("=" * 70)
         
         results = []
-        for i, h in enumerate(highlights, 1):
+        # 并发请求，结果仍按片段顺序逐个输出
+        summaries = self.summarize_highlights(highlights)
+        for i, (h, ai_info) in enumerate(zip(highlights, summaries), 1):
             duration = h['end'] - h['start']
 
-            print(f"\n[{i}/{len(highlights)}] 分析片段中...")
-            ai_info = self.generate_summary_with_ai(h)
+            print(f"\n[{i}/{len(highlights)}] 片段分析完成")
             
             # 默认值填充，防止KeyError
             title = ai_info.get('title', 'AI生成失败')
@@ -445,7 +601,10 @@ class DanmakuAnalyzer:
                 **ai_info
             }
             results.append(result_item)
-            
+
+        if self.response_cache and self.response_cache.hits:
+            print(f"\n♻️ AI 回复缓存命中 {self.response_cache.hits}/{len(highlights)} 个片段")
+
         # === 最终汇总 ===
         print("\n" + "=" * 70)
         print("最终汇总 (按热度排序)")
@@ -478,10 +637,63 @@ class DanmakuAnalyzer:
         except Exception as e:
             print(f"导出失败: {e}")
 
+def run_live():
+    sources = {
+        'tail': lambda: tail_file(LiveConfig.FILE),
+        'stdin': read_stdin,
+        'socket': lambda: read_socket(LiveConfig.HOST, LiveConfig.PORT),
+        'replay': lambda: replay_ass(LiveConfig.FILE, LiveConfig.REPLAY_SPEED),
+    }
+    if LiveConfig.SOURCE not in sources:
+        print(f"❌ 未知的实时弹幕来源: {LiveConfig.SOURCE}")
+        return
+    if LiveConfig.SOURCE in ('tail', 'replay') and not os.path.exists(LiveConfig.FILE):
+        print(f"❌ 错误: 找不到文件 {LiveConfig.FILE}")
+        return
+
+    def format_time(seconds):
+        h = int(seconds // 3600)
+        m = int((seconds % 3600) // 60)
+        s = int(seconds % 60)
+        return f"{h:02d}:{m:02d}:{s:02d}"
+
+    emitted = []
+
+    def emit(h):
+        emitted.append(h)
+        print(f"🔥 高光候选: {format_time(h['start'])} - {format_time(h['end'])} "
+              f"(高光时长:{h['end'] - h['start']:.0f}秒)(弹幕:{h['count']}, 热度:{h['score']:.1f})")
+        try:
+            with open(LiveConfig.OUTPUT_FILE, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(h, ensure_ascii=False) + '\n')
+        except Exception as e:
+            print(f"导出失败: {e}")
+
+    print("=" * 70)
+    print(f"A-SOUL 弹幕高光实时检测 (来源: {LiveConfig.SOURCE}, 热度阈值: {LiveConfig.THRESHOLD})")
+    print("=" * 70)
+    detector = LiveHighlightDetector(
+        WeightClassifier(DANMAKU_WEIGHTS, LONG_TEXT_BONUS),
+        window_size=AnalyzeConfig.WINDOW_SIZE,
+        threshold=LiveConfig.THRESHOLD,
+        merge_gap=AnalyzeConfig.MERGE_THRESHOLD,
+        min_duration=AnalyzeConfig.MIN_DURATION,
+        max_duration=AnalyzeConfig.MAX_DURATION,
+        on_highlight=emit
+    )
+    try:
+        run_detector(detector, sources[LiveConfig.SOURCE](), realtime=LiveConfig.SOURCE != 'replay')
+    except KeyboardInterrupt:
+        detector.flush()
+    print(f"\n✓ 实时检测结束，共输出 {len(emitted)} 个高光候选 (保存在 {LiveConfig.OUTPUT_FILE})")
+
 if __name__ == "__main__":
     try:
-        app = DanmakuAnalyzer()
-        app.run()
+        if LiveConfig.SOURCE:
+            run_live()
+        else:
+            app = DanmakuAnalyzer()
+            app.run()
     except SystemExit:
         pass # 允许正常退出
     except Exception as e:
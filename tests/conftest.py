@@ -0,0 +1,7 @@
+import os
+import sys
+
+# 与各脚本一致：项目根目录用于导入 core，utils 目录用于导入其中的同级模块
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'utils'))
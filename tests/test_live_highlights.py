@@ -0,0 +1,111 @@
+import os
+import threading
+import types
+
+import pytest
+
+from core import live_highlights
+from core.live_highlights import LiveHighlightDetector, read_stdin, replay_ass, run_detector
+
+class UnitWeights:
+    """每条弹幕权重为 1，热度即窗口内弹幕数"""
+
+    def weight(self, text):
+        return 1.0
+
+def _write_ass(path, times):
+    lines = ["[Events]", "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text"]
+    for i, t in enumerate(times):
+        h, rest = divmod(t, 3600)
+        m, s = divmod(rest, 60)
+        lines.append(f"Dialogue: 0,{int(h)}:{int(m):02d}:{s:05.2f},0:00:00.00,Danmaku,,0,0,0,,弹幕{i}")
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    return str(path)
+
+def _detector(**kwargs):
+    params = dict(window_size=10, threshold=5, merge_gap=10, lookback=5, min_duration=5, max_duration=30)
+    params.update(kwargs)
+    return LiveHighlightDetector(UnitWeights(), **params)
+
+def test_highlight_closes_during_idle_period(tmp_path, monkeypatch):
+    # 100~110 秒每 0.5 秒一条弹幕，之后直播间安静
+    ass_path = _write_ass(tmp_path / 'burst.ass', [100 + i * 0.5 for i in range(20)])
+    clock = {'now': 0.0}
+    monkeypatch.setattr(live_highlights, 'time', types.SimpleNamespace(
+        monotonic=lambda: clock['now'], sleep=lambda seconds: None
+    ))
+
+    phase = {'name': 'replay'}
+    emitted_in = []
+
+    def source():
+        yield from replay_ass(ass_path, speed=0)
+        phase['name'] = 'idle'
+        for _ in range(10):
+            clock['now'] += 5
+            yield None
+        phase['name'] = 'flush'
+
+    detector = _detector(on_highlight=lambda h: emitted_in.append(phase['name']))
+    highlights = run_detector(detector, source(), realtime=True)
+
+    # 没有新弹幕时也要按墙钟推进窗口，高潮在空闲期间结束，而不是等到来源结束才 flush
+    assert emitted_in == ['idle']
+    assert len(highlights) == 1
+    assert highlights[0]['start'] <= 100 <= highlights[0]['end']
+
+def test_max_duration_split_does_not_overlap(tmp_path):
+    # 持续 100 秒的高潮，按 max_duration=30 截断为多个片段
+    ass_path = _write_ass(tmp_path / 'long.ass', [10 + i * 0.25 for i in range(400)])
+    highlights = run_detector(_detector(), replay_ass(ass_path, speed=0), realtime=False)
+
+    assert len(highlights) >= 3
+    for h in highlights:
+        assert h['end'] - h['start'] <= 30
+    for previous, current in zip(highlights, highlights[1:]):
+        assert previous['end'] <= current['start']
+
+@pytest.mark.skipif(os.name == 'nt', reason="Windows 下管道不支持 select")
+def test_stdin_idle_ticks_close_highlight(monkeypatch):
+    read_fd, write_fd = os.pipe()
+    lines = ''.join(f"{100 + i * 0.5}\t弹幕{i}\n" for i in range(20))
+    os.write(write_fd, lines.encode('utf-8'))
+    stdin = os.fdopen(read_fd, 'r', encoding='utf-8')
+    monkeypatch.setattr(live_highlights.sys, 'stdin', stdin)
+    clock = {'now': 0.0}
+    monkeypatch.setattr(live_highlights, 'time', types.SimpleNamespace(
+        monotonic=lambda: clock['now'], sleep=lambda seconds: None
+    ))
+    # 推送端不关闭管道：读取方必须靠空闲时产出的 None 推进时间；超时后关闭管道，避免回归时测试卡住
+    closer = threading.Timer(5, os.close, [write_fd])
+    closer.start()
+
+    emitted_in = []
+    phase = {'name': 'reading'}
+
+    def source():
+        ticks = 0
+        for item in read_stdin(idle_timeout=0.01):
+            if item is None:
+                phase['name'] = 'idle'
+                clock['now'] += 5
+                ticks += 1
+                if ticks >= 10:
+                    break
+            yield item
+        phase['name'] = 'flush'
+
+    try:
+        detector = _detector(on_highlight=lambda h: emitted_in.append(phase['name']))
+        highlights = run_detector(detector, source(), realtime=True)
+    finally:
+        closer.cancel()
+        closer.join()
+        stdin.close()
+        try:
+            os.close(write_fd)
+        except OSError:
+            pass
+
+    assert emitted_in == ['idle']
+    assert len(highlights) == 1
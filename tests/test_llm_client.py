@@ -0,0 +1,100 @@
+import json
+import threading
+import time
+
+import pytest
+import requests
+
+from core import llm_client
+from core.http_retry import MAX_RETRY_AFTER
+from core.llm_client import ChatCompletionClient, ChatCompletionError, map_concurrently
+
+def _response(status_code, content=None, headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    if content is not None:
+        response._content = json.dumps({'choices': [{'message': {'content': content}}]}).encode('utf-8')
+    else:
+        response._content = b'{}'
+    response.headers.update(headers or {})
+    return response
+
+class StubServer:
+    """按顺序返回预设的响应，记录每次请求的 prompt"""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.prompts = []
+        self._lock = threading.Lock()
+
+    def request(self, method, url, **kwargs):
+        with self._lock:
+            self.prompts.append(kwargs['json']['messages'][0]['content'])
+            return self.responses.pop(0)
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """记录重试前的等待秒数，不真正等待"""
+    recorded = []
+    monkeypatch.setattr(llm_client.time, 'sleep', recorded.append)
+    return recorded
+
+def _client(monkeypatch, responses, **kwargs):
+    server = StubServer(responses)
+
+    def request(session, method, url, **request_kwargs):
+        return server.request(method, url, **request_kwargs)
+
+    monkeypatch.setattr(requests.Session, 'request', request)
+    return ChatCompletionClient('http://llm.test/v1/chat/completions', 'key', 'model', **kwargs), server
+
+def test_429_with_retry_after_waits_requested_time(monkeypatch, sleeps):
+    client, server = _client(monkeypatch, [_response(429, headers={'Retry-After': '7'}), _response(200, 'ok')])
+    assert client.complete('hi') == 'ok'
+    assert sleeps == [7.0]
+    assert len(server.prompts) == 2
+
+def test_long_retry_after_is_capped_not_discarded(monkeypatch, sleeps):
+    client, _ = _client(monkeypatch, [_response(429, headers={'Retry-After': '3600'}), _response(200, 'ok')])
+    assert client.complete('hi') == 'ok'
+    assert sleeps == [MAX_RETRY_AFTER]
+
+def test_429_without_retry_after_uses_exponential_backoff(monkeypatch, sleeps):
+    client, _ = _client(monkeypatch, [_response(429), _response(429), _response(200, 'ok')], backoff=1.0)
+    assert client.complete('hi') == 'ok'
+    assert len(sleeps) == 2
+    assert 0.5 <= sleeps[0] <= 1.0
+    assert 1.0 <= sleeps[1] <= 2.0
+
+def test_5xx_is_retried_until_success(monkeypatch, sleeps):
+    client, server = _client(monkeypatch, [_response(503), _response(502), _response(200, 'ok')])
+    assert client.complete('hi') == 'ok'
+    assert len(server.prompts) == 3
+    assert len(sleeps) == 2
+
+def test_retries_exhausted_raises_with_status(monkeypatch, sleeps):
+    client, server = _client(monkeypatch, [_response(503)] * 3, max_retries=2)
+    with pytest.raises(ChatCompletionError) as excinfo:
+        client.complete('hi')
+    assert excinfo.value.status_code == 503
+    assert len(server.prompts) == 3
+
+def test_client_error_is_not_retried(monkeypatch, sleeps):
+    client, server = _client(monkeypatch, [_response(400), _response(200, 'ok')])
+    with pytest.raises(ChatCompletionError):
+        client.complete('hi')
+    assert len(server.prompts) == 1
+    assert sleeps == []
+
+def test_map_concurrently_preserves_order(monkeypatch):
+    def request(session, method, url, **kwargs):
+        prompt = kwargs['json']['messages'][0]['content']
+        # 越靠前的请求越晚完成
+        time.sleep(0.01 * (10 - int(prompt)))
+        return _response(200, f"reply-{prompt}")
+
+    monkeypatch.setattr(requests.Session, 'request', request)
+    client = ChatCompletionClient('http://llm.test/v1/chat/completions', 'key', 'model')
+    prompts = [str(i) for i in range(10)]
+    results = list(map_concurrently(client.complete, prompts, max_workers=4))
+    assert results == [f"reply-{p}" for p in prompts]
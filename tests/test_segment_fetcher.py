@@ -0,0 +1,87 @@
+import threading
+import time
+
+import pytest
+import requests
+
+import segment_fetcher
+from core.http_retry import MAX_RETRY_AFTER
+from segment_fetcher import SegmentFetcher
+
+def _response(status_code, content=b'', headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = content
+    response.headers.update(headers or {})
+    return response
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """记录重试前的等待秒数，不真正等待"""
+    recorded = []
+    monkeypatch.setattr(segment_fetcher.time, 'sleep', recorded.append)
+    return recorded
+
+def _fetcher(monkeypatch, responses, **kwargs):
+    responses = list(responses)
+    calls = []
+    lock = threading.Lock()
+
+    def request(session, method, url, params=None, **request_kwargs):
+        with lock:
+            calls.append(params)
+            return responses.pop(0)
+
+    monkeypatch.setattr(requests.Session, 'request', request)
+    # rate=0 关闭令牌桶限流，只测试重试逻辑
+    kwargs.setdefault('rate', 0)
+    return SegmentFetcher(**kwargs), calls
+
+def test_429_with_retry_after_waits_requested_time(monkeypatch, sleeps):
+    fetcher, calls = _fetcher(monkeypatch, [_response(429, headers={'Retry-After': '7'}), _response(200, b'seg')])
+    assert fetcher.fetch_segment(1, 2, 1) == b'seg'
+    assert sleeps == [7.0]
+    assert len(calls) == 2
+
+def test_long_retry_after_is_capped_not_discarded(monkeypatch, sleeps):
+    fetcher, _ = _fetcher(monkeypatch, [_response(429, headers={'Retry-After': '3600'}), _response(200, b'seg')])
+    assert fetcher.fetch_segment(1, 2, 1) == b'seg'
+    assert sleeps == [MAX_RETRY_AFTER]
+
+def test_429_without_retry_after_uses_exponential_backoff(monkeypatch, sleeps):
+    fetcher, _ = _fetcher(monkeypatch, [_response(412), _response(429), _response(200, b'seg')], backoff=0.5)
+    assert fetcher.fetch_segment(1, 2, 1) == b'seg'
+    assert len(sleeps) == 2
+    assert 0.25 <= sleeps[0] <= 0.5
+    assert 0.5 <= sleeps[1] <= 1.0
+
+def test_5xx_is_retried_until_success(monkeypatch, sleeps):
+    fetcher, calls = _fetcher(monkeypatch, [_response(503), _response(500), _response(200, b'seg')])
+    assert fetcher.fetch_segment(1, 2, 1) == b'seg'
+    assert len(calls) == 3
+    assert fetcher.requests_sent == 3
+
+def test_retries_exhausted_returns_none(monkeypatch, sleeps):
+    fetcher, calls = _fetcher(monkeypatch, [_response(503)] * 3, max_retries=2)
+    assert fetcher.fetch_segment(1, 2, 1) is None
+    assert len(calls) == 3
+
+def test_error_json_body_is_not_a_segment(monkeypatch, sleeps):
+    fetcher, _ = _fetcher(monkeypatch, [_response(200, b'{"code":-404,"message":"not found"}')])
+    assert fetcher.fetch_segment(1, 2, 1) is None
+
+def test_fetch_pages_preserves_page_and_segment_order(monkeypatch):
+    def request(session, method, url, params=None, **kwargs):
+        # 越靠前的分片越晚完成
+        time.sleep(0.005 * (6 - params['segment_index']))
+        return _response(200, f"{params['oid']}#{params['segment_index']}".encode())
+
+    monkeypatch.setattr(requests.Session, 'request', request)
+    fetcher = SegmentFetcher(max_workers=4, rate=0)
+    progress = []
+    results = fetcher.fetch_pages([(100, 1, 5), (200, 1, 3)], on_progress=lambda done, total: progress.append(done))
+    assert results == [
+        [f"100#{i}".encode() for i in range(1, 6)],
+        [f"200#{i}".encode() for i in range(1, 4)],
+    ]
+    assert progress == list(range(1, 9))
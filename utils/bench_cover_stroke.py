@@ -0,0 +1,59 @@
+import os
+import sys
+import time
+
+from PIL import Image, ImageChops, ImageFont
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from core.cover_generator import CoverGenerator
+
+# ================= 配置区域 =================
+# 对比封面描边的两种实现：原始的整幅画布多层描边 与 包围盒内一次膨胀的快速描边
+FONT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                         "assets", "font", "WenYue-XinQingNianTi-W8-J-2.otf")
+CANVAS_SIZE = (1920, 1080)      # 封面尺寸
+TEXTS = ["嘉然今天吃什么!", "这也太好笑了吧"]   # 测试文字（每行一次描边）
+TITLE_SIZE = 150
+STROKE_WIDTHS = [8, 12]         # 内置样式使用的描边宽度
+REPEAT = 5                      # 每种实现重复次数，取平均
+# ===========================================
+
+def render(renderer, font, stroke_width):
+    canvas = Image.new('RGBA', CANVAS_SIZE, (0, 0, 0, 0))
+    width, height = CANVAS_SIZE
+    for i, text in enumerate(TEXTS):
+        y = int(height * (0.2 + 0.55 * i))
+        renderer(canvas, (width / 2, y), text, font, (255, 225, 0), (0, 0, 0), stroke_width)
+    return canvas
+
+def benchmark(renderer, font, stroke_width):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        canvas = render(renderer, font, stroke_width)
+    return (time.perf_counter() - start) / REPEAT, canvas
+
+def main():
+    if not os.path.exists(FONT_PATH):
+        print(f"❌ 未找到字体文件: {FONT_PATH}")
+        return
+    font = ImageFont.truetype(FONT_PATH, TITLE_SIZE)
+    print(f"画布: {CANVAS_SIZE[0]}x{CANVAS_SIZE[1]} | 文字行数: {len(TEXTS)} | 重复: {REPEAT} 次\n")
+
+    for stroke_width in STROKE_WIDTHS:
+        legacy_time, legacy = benchmark(CoverGenerator.draw_text_with_multilayer_stroke, font, stroke_width)
+        fast_time, fast = benchmark(CoverGenerator.draw_text_with_stroke, font, stroke_width)
+
+        diff_box = ImageChops.difference(legacy, fast).getbbox()
+        if diff_box is None:
+            diff_text = "像素完全一致"
+        else:
+            max_diff = max(high for _, high in ImageChops.difference(legacy, fast).getextrema())
+            diff_text = f"存在差异 (区域 {diff_box}, 最大通道差 {max_diff})"
+
+        print(f"描边宽度 {stroke_width}:")
+        print(f"  多层描边 (原始): {legacy_time * 1000:8.1f} ms")
+        print(f"  包围盒描边 (新): {fast_time * 1000:8.1f} ms  ({legacy_time / fast_time:.1f}x)")
+        print(f"  对比结果: {diff_text}\n")
+
+if __name__ == "__main__":
+    main()
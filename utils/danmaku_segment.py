@@ -0,0 +1,194 @@
+from array import array
+
+# ==================== B站弹幕分片 (seg.so) 解码 ====================
+# DmSegMobileReply: 字段 1 为重复的 DanmakuElem
+# DanmakuElem: 2=progress(毫秒) 3=mode 4=fontsize 5=color 7=content，其余字段跳过
+
+ALL_FIELDS = ('progress', 'mode', 'fontsize', 'color', 'content')
+# 写 ASS/SRT 只需要这几列
+DEFAULT_FIELDS = ('progress', 'mode', 'color', 'content')
+
+_CONTENT_FIELD = 7
+_ELEM_TAG = (1 << 3) | 2
+
+class DanmakuColumns:
+    """
+    按列存储的弹幕分片解码结果：progress / mode / fontsize / color 为整数数组，
+    content 为拼接后的 UTF-8 字节串与每条的 (偏移, 长度)，取用时才解码为字符串。
+    只保存 fields 中列出的字段；迭代或 to_dicts() 时生成与 decode_danmaku_segment 相同的字典。
+    """
+
+    def __init__(self, fields=DEFAULT_FIELDS):
+        unknown = set(fields) - set(ALL_FIELDS)
+        if unknown:
+            raise ValueError(f"未知的弹幕字段: {sorted(unknown)}")
+        self.fields = tuple(f for f in ALL_FIELDS if f in fields)
+        self.progress = array('q')
+        self.mode = array('i')
+        self.fontsize = array('i')
+        self.color = array('I')
+        self.content_offsets = array('Q')
+        self.content_lengths = array('I')
+        self.content_blob = bytearray()
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def content(self, index):
+        offset = self.content_offsets[index]
+        return self.content_blob[offset:offset + self.content_lengths[index]].decode('utf-8', errors='ignore')
+
+    def __iter__(self):
+        columns = [(name, getattr(self, name)) for name in self.fields if name != 'content']
+        with_content = 'content' in self.fields
+        for i in range(self._count):
+            dm = {name: values[i] for name, values in columns}
+            if with_content:
+                dm['content'] = self.content(i)
+            yield dm
+
+    def to_dicts(self):
+        return list(self)
+
+    def sort(self):
+        """按 progress 稳定排序（未解码 progress 或已有序时不做任何事）"""
+        if 'progress' not in self.fields:
+            return
+        progress = self.progress
+        if all(progress[i] <= progress[i + 1] for i in range(len(progress) - 1)):
+            return
+        order = sorted(range(self._count), key=progress.__getitem__)
+        for name in ('progress', 'mode', 'fontsize', 'color', 'content_offsets', 'content_lengths'):
+            values = getattr(self, name)
+            if values:
+                setattr(self, name, array(values.typecode, (values[i] for i in order)))
+
+def _fit_int32(value, unsigned=False):
+    """负数的 int32 在 varint 中编码为 64 位补码，截回 32 位"""
+    value &= 0xFFFFFFFF
+    if not unsigned and value > 0x7fffffff:
+        value -= 1 << 32
+    return value
+
+def _read_varint(buf, pos):
+    byte = buf[pos]
+    if byte < 0x80:
+        return byte, pos + 1
+    result = byte & 0x7f
+    shift = 7
+    pos += 1
+    while True:
+        byte = buf[pos]
+        pos += 1
+        result |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return result, pos
+        shift += 7
+
+def _skip_varint(buf, pos):
+    while buf[pos] & 0x80:
+        pos += 1
+    return pos + 1
+
+def _skip_field(buf, pos, wire_type):
+    if wire_type == 0:
+        return _skip_varint(buf, pos)
+    if wire_type == 1:
+        return pos + 8
+    if wire_type == 2:
+        length, pos = _read_varint(buf, pos)
+        return pos + length
+    if wire_type == 5:
+        return pos + 4
+    raise ValueError(f"不支持的 wire type: {wire_type}")
+
+def decode_segment(data, columns=None, fields=DEFAULT_FIELDS):
+    """
+    解码一个 seg.so 分片，结果追加到 columns（为 None 时新建，只解码 fields 中的字段）并返回。
+    用 memoryview 与整数游标遍历，不复制分片数据；未请求的字段只跳过、不解码。
+    分片被截断时保留截断处之前的完整弹幕。
+    """
+    if columns is None:
+        columns = DanmakuColumns(fields)
+    buf = memoryview(data).cast('B')
+    end = len(buf)
+
+    fields = columns.fields
+    want_progress, want_mode = 'progress' in fields, 'mode' in fields
+    want_fontsize, want_color = 'fontsize' in fields, 'color' in fields
+    want_content = 'content' in fields
+    offsets, lengths, blob = columns.content_offsets, columns.content_lengths, columns.content_blob
+
+    pos = 0
+    try:
+        while pos < end:
+            tag, pos = _read_varint(buf, pos)
+            if tag != _ELEM_TAG:
+                pos = _skip_field(buf, pos, tag & 0x07)
+                continue
+            length, pos = _read_varint(buf, pos)
+            elem_end = pos + length
+            if elem_end > end:
+                break
+
+            progress, mode, fontsize, color = 0, 1, 25, 16777215
+            content_start = content_length = 0
+            while pos < elem_end:
+                # 字段标签几乎都是单字节，先走快速路径
+                tag = buf[pos]
+                if tag < 0x80:
+                    pos += 1
+                else:
+                    tag, pos = _read_varint(buf, pos)
+                field_num = tag >> 3
+                wire_type = tag & 0x07
+                if wire_type == 0:
+                    if field_num == 2 and want_progress:
+                        progress, pos = _read_varint(buf, pos)
+                    elif field_num == 3 and want_mode:
+                        mode, pos = _read_varint(buf, pos)
+                    elif field_num == 4 and want_fontsize:
+                        fontsize, pos = _read_varint(buf, pos)
+                    elif field_num == 5 and want_color:
+                        color, pos = _read_varint(buf, pos)
+                    else:
+                        pos = _skip_varint(buf, pos)
+                elif wire_type == 2:
+                    size, pos = _read_varint(buf, pos)
+                    if field_num == _CONTENT_FIELD:
+                        content_start, content_length = pos, size
+                    pos += size
+                else:
+                    pos = _skip_field(buf, pos, wire_type)
+            if pos != elem_end:
+                # 元素内的字段越过了元素边界，跳过这条弹幕
+                pos = elem_end
+                continue
+
+            if want_progress:
+                columns.progress.append(progress if progress <= 0x7fffffff else _fit_int32(progress))
+            if want_mode:
+                columns.mode.append(mode if mode <= 0x7fffffff else _fit_int32(mode))
+            if want_fontsize:
+                columns.fontsize.append(fontsize if fontsize <= 0x7fffffff else _fit_int32(fontsize))
+            if want_color:
+                columns.color.append(color if color <= 0x7fffffff else _fit_int32(color, unsigned=True))
+            if want_content:
+                offsets.append(len(blob))
+                lengths.append(content_length)
+                blob += buf[content_start:content_start + content_length]
+            columns._count += 1
+    except (IndexError, ValueError, OverflowError):
+        # 截断或损坏的数据：丢弃当前不完整的弹幕，保留之前的结果
+        pass
+    return columns
+
+class SimpleProtobufDecoder:
+    """兼容旧接口：decode_danmaku_segment() 返回包含全部字段的字典列表"""
+
+    def __init__(self, data):
+        self.data = data
+
+    def decode_danmaku_segment(self):
+        return decode_segment(self.data, fields=ALL_FIELDS).to_dicts()
@@ -1,13 +1,21 @@
 import os
 import re
 import time
-import math
 import random
+import sys
 import requests
 import yt_dlp
-from io import BytesIO
 from datetime import datetime
 
+# 同目录的模块按文件路径导入，在仓库根目录运行或 python -m utils.xxx 时同样可用；
+# 项目根目录用于导入 core 中的共用模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# SimpleProtobufDecoder 保留在此导出，兼容旧的调用方式
+from danmaku_segment import DanmakuColumns, SimpleProtobufDecoder, decode_segment
+from segment_cache import SEGMENT_CACHE_DIRNAME, SegmentCache
+from segment_fetcher import SegmentFetcher, segment_count
+
 # ==================== 配置区域 ====================
 
 # 1. 视频输入（支持BV号或完整链接）
@@ -30,6 +38,16 @@ DOWNLOAD_ALL_PARTS = True  # 是否下载所有分P（True=下载所有P，False
 # 6. 字幕纠错选项
 AUTO_CORRECT_SUBTITLE = True  # 是否自动纠错字幕（需要asr_dict.txt字典文件）
 
+# 7. 弹幕分片下载选项（所有分P的分片一起并发下载）
+FETCH_WORKERS = 4   # 同时进行的请求数
+FETCH_RATE = 8      # 每秒最多发起的请求数（遇到 412/429 风控可调小）
+
+# 8. 弹幕分片缓存（原始分片保存在输出目录的 .danmaku_cache 下，重复运行只请求过期的分片）
+SEGMENT_CACHE = True
+CACHE_REFRESH = "stale"         # "stale" = 只重新请求过期的分片；"never" = 有缓存就不请求；"all" = 全部重新请求
+CACHE_MAX_AGE_HOURS = 168       # 视频发布已久、弹幕基本稳定时，分片缓存的有效期
+CACHE_RECENT_MAX_AGE_HOURS = 1  # 视频发布 3 天内下载的分片弹幕仍在增长，缓存有效期更短
+
 # ==================================================
 
 # ==================== 字幕纠错器 ====================
@@ -128,68 +146,6 @@ class FileBasedCorrector:
             print(f"❌ 纠错文件时出错 {file_path}: {e}")
             return False
 
-# ==================== Protobuf 解码器 ====================
-class SimpleProtobufDecoder:
-    def __init__(self, data):
-        self.stream = BytesIO(data)
-        self.end = len(data)
-
-    def _read_varint(self):
-        result = 0
-        shift = 0
-        while True:
-            if self.stream.tell() >= self.end:
-                return 0
-            byte_data = self.stream.read(1)
-            if not byte_data: return 0
-            byte = ord(byte_data)
-            result |= (byte & 0x7f) << shift
-            if not (byte & 0x80):
-                break
-            shift += 7
-        return result
-
-    def decode_danmaku_segment(self):
-        danmakus = []
-        while self.stream.tell() < self.end:
-            tag = self._read_varint()
-            field_num = tag >> 3
-            wire_type = tag & 0x07
-            if field_num == 1 and wire_type == 2:
-                length = self._read_varint()
-                start_pos = self.stream.tell()
-                danmaku = self._decode_danmaku_elem(start_pos + length)
-                if danmaku:
-                    danmakus.append(danmaku)
-            else:
-                self._skip_field(wire_type)
-        return danmakus
-
-    def _decode_danmaku_elem(self, end_pos):
-        dm = {'progress': 0, 'mode': 1, 'fontsize': 25, 'color': 16777215, 'content': ''}
-        while self.stream.tell() < end_pos:
-            tag = self._read_varint()
-            field_num = tag >> 3
-            wire_type = tag & 0x07
-            if field_num == 2: dm['progress'] = self._read_varint()
-            elif field_num == 3: dm['mode'] = self._read_varint()
-            elif field_num == 4: dm['fontsize'] = self._read_varint()
-            elif field_num == 5: dm['color'] = self._read_varint()
-            elif field_num == 7:
-                length = self._read_varint()
-                dm['content'] = self.stream.read(length).decode('utf-8', errors='ignore')
-            else:
-                self._skip_field(wire_type)
-        return dm
-
-    def _skip_field(self, wire_type):
-        if wire_type == 0: self._read_varint()
-        elif wire_type == 1: self.stream.read(8)
-        elif wire_type == 2:
-            length = self._read_varint()
-            self.stream.read(length)
-        elif wire_type == 5: self.stream.read(4)
-
 # ==================== 主下载器类 ====================
 class BilibiliDownloader:
     def __init__(self, video_input, sessdata="", output_dir="downloads", auto_correct=False):
@@ -223,6 +179,7 @@ class BilibiliDownloader:
             self.headers['Cookie'] = f'SESSDATA={clean_sessdata}'
         
         self.aid = None
+        self.pubdate = None
         self.title = "unknown"
         self.author = "unknown"
         self.pages = []  # 存储所有分P信息
@@ -251,6 +208,7 @@ class BilibiliDownloader:
         
         video_data = data['data']
         self.aid = video_data['aid']
+        self.pubdate = video_data.get('pubdate')
         self.title = video_data['title']
         self.author = video_data['owner']['name']
         
@@ -390,40 +348,45 @@ class BilibiliDownloader:
         print(f"{'='*50}")
         
         pages_to_download = self.pages if download_all else [self.pages[0]]
-        
-        for idx, page in enumerate(pages_to_download, 1):
+        jobs = [(page['cid'], self.aid, segment_count(page['duration'])) for page in pages_to_download]
+        print(f"[*] 共 {sum(total for _, _, total in jobs)} 个弹幕分片，并发下载中 (并发 {FETCH_WORKERS}，每秒最多 {FETCH_RATE} 个请求)")
+        
+        cache = SegmentCache(
+            os.path.join(self.save_dir, SEGMENT_CACHE_DIRNAME), refresh=CACHE_REFRESH,
+            max_age=CACHE_MAX_AGE_HOURS * 3600, recent_max_age=CACHE_RECENT_MAX_AGE_HOURS * 3600,
+            published_at=self.pubdate
+        ) if SEGMENT_CACHE else None
+        fetcher = SegmentFetcher(self.headers, max_workers=FETCH_WORKERS, rate=FETCH_RATE, cache=cache)
+        try:
+            payloads_by_page = fetcher.fetch_pages(
+                jobs, on_progress=lambda done, total: print(f"\r[*] 下载弹幕分片 {done}/{total} ...", end='')
+            )
+        finally:
+            fetcher.close()
+            if cache:
+                cache.save()
+        print()
+        if cache:
+            print(f"[*] 从缓存读取 {cache.hits} 个分片，实际发出 {fetcher.requests_sent} 个请求")
+        
+        for idx, (page, payloads) in enumerate(zip(pages_to_download, payloads_by_page), 1):
             page_num = idx
-            cid = page['cid']
             part_title = page['part']
-            duration = page['duration']
             
             if len(self.pages) > 1:
-                print(f"\n[*] P{page_num}: {part_title}")
+                print(f"\n[*] P{page_num}: {part_title} ({len(payloads)} 个弹幕分片)")
             
             # 清空之前的弹幕列表
-            self.danmaku_list = []
-            
-            total_segments = math.ceil(duration / 360)
-            print(f"[*] P{page_num} 共 {total_segments} 个弹幕分片")
-            
-            for i in range(1, total_segments + 1):
-                print(f"\r[*] P{page_num} 下载弹幕分片 {i}/{total_segments} ...", end='')
-                url = f"https://api.bilibili.com/x/v2/dm/web/seg.so?type=1&oid={cid}&pid={self.aid}&segment_index={i}"
-                resp = requests.get(url, headers=self.headers)
-                
-                if resp.status_code == 200:
-                    if resp.content.startswith(b'{') and b'"code":' in resp.content:
-                        continue
-                    try:
-                        decoder = SimpleProtobufDecoder(resp.content)
-                        self.danmaku_list.extend(decoder.decode_danmaku_segment())
-                    except:
-                        pass
+            self.danmaku_list = DanmakuColumns()
+            # 按分片顺序追加解码结果，只解码写文件需要的字段
+            for payload in payloads:
+                if payload:
+                    decode_segment(payload, self.danmaku_list)
             
-            print(f"\n[*] P{page_num} 弹幕下载完成，共 {len(self.danmaku_list)} 条")
+            print(f"[*] P{page_num} 弹幕下载完成，共 {len(self.danmaku_list)} 条")
             
             if self.danmaku_list:
-                self.danmaku_list.sort(key=lambda x: x['progress'])
+                self.danmaku_list.sort()
                 
                 # 文件名添加P数标识
                 part_suffix = f"_P{page_num}" if len(self.pages) > 1 else ""
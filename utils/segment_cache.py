@@ -0,0 +1,146 @@
+import json
+import os
+import threading
+import time
+
+# ==================== 弹幕分片 (seg.so) 本地缓存 ====================
+# 目录结构: <cache_dir>/<cid>/<segment_index>.seg 保存原始分片，
+# <cache_dir>/index.json 记录每个分片的下载时间与条件请求信息 (ETag / Last-Modified)
+
+SEGMENT_CACHE_DIRNAME = ".danmaku_cache"
+SEGMENT_CACHE_INDEX = "index.json"
+SEGMENT_CACHE_VERSION = 1
+
+# 刷新策略
+REFRESH_STALE = "stale"     # 只重新请求过期的分片
+REFRESH_NEVER = "never"     # 有缓存就不请求
+REFRESH_ALL = "all"         # 全部重新请求（带条件请求头，未变化的分片服务端可返回 304）
+REFRESH_MODES = (REFRESH_STALE, REFRESH_NEVER, REFRESH_ALL)
+
+class SegmentCache:
+    """
+    按 (cid, segment_index) 缓存原始弹幕分片。
+    分片是否过期取决于下载时视频发布了多久：发布后 settle_time 内下载的分片弹幕还在快速增长，
+    recent_max_age 后即过期；之后下载的分片弹幕基本稳定，max_age 后才过期。
+    线程安全；修改后需调用 save() 写回索引。
+    """
+
+    def __init__(self, cache_dir, refresh=REFRESH_STALE, max_age=7 * 86400, recent_max_age=3600,
+                 settle_time=3 * 86400, published_at=None):
+        if refresh not in REFRESH_MODES:
+            raise ValueError(f"未知的缓存刷新模式: {refresh}（可选 {', '.join(REFRESH_MODES)}）")
+        self.cache_dir = cache_dir
+        self.refresh = refresh
+        self.max_age = max_age
+        self.recent_max_age = recent_max_age
+        self.settle_time = settle_time
+        self.published_at = published_at
+        self.hits = 0
+        self._lock = threading.Lock()
+        self._dirty = False
+        self._entries = self._load_index()
+
+    def _index_path(self):
+        return os.path.join(self.cache_dir, SEGMENT_CACHE_INDEX)
+
+    def _payload_path(self, cid, segment_index):
+        return os.path.join(self.cache_dir, str(cid), f"{segment_index}.seg")
+
+    @staticmethod
+    def _key(cid, segment_index):
+        return f"{cid}/{segment_index}"
+
+    def _load_index(self):
+        try:
+            with open(self._index_path(), 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(index, dict) or index.get('version') != SEGMENT_CACHE_VERSION:
+            return {}
+        entries = index.get('segments')
+        return entries if isinstance(entries, dict) else {}
+
+    def lookup(self, cid, segment_index):
+        """返回分片的索引记录（fetched_at / etag / last_modified / size），没有缓存时返回 None"""
+        with self._lock:
+            return self._entries.get(self._key(cid, segment_index))
+
+    def is_stale(self, entry, now=None):
+        if self.refresh == REFRESH_NEVER:
+            return False
+        if self.refresh == REFRESH_ALL:
+            return True
+        now = time.time() if now is None else now
+        fetched_at = entry.get('fetched_at', 0)
+        max_age = self.max_age
+        if self.published_at and fetched_at - self.published_at < self.settle_time:
+            max_age = self.recent_max_age
+        return now - fetched_at > max_age
+
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def read(self, cid, segment_index):
+        """读取缓存的分片内容，文件缺失或大小与索引不符时返回 None"""
+        entry = self.lookup(cid, segment_index)
+        if entry is None:
+            return None
+        try:
+            with open(self._payload_path(cid, segment_index), 'rb') as f:
+                payload = f.read()
+        except OSError:
+            return None
+        if len(payload) != entry.get('size'):
+            return None
+        with self._lock:
+            self.hits += 1
+        return payload
+
+    def store(self, cid, segment_index, payload, etag=None, last_modified=None):
+        path = self._payload_path(cid, segment_index)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"\n[-] 分片缓存写入失败: {e}")
+            return
+        with self._lock:
+            self._entries[self._key(cid, segment_index)] = {
+                'fetched_at': time.time(),
+                'etag': etag,
+                'last_modified': last_modified,
+                'size': len(payload),
+            }
+            self._dirty = True
+
+    def touch(self, cid, segment_index):
+        """服务端返回 304（未变化）时只更新下载时间"""
+        with self._lock:
+            entry = self._entries.get(self._key(cid, segment_index))
+            if entry is not None:
+                entry['fetched_at'] = time.time()
+                self._dirty = True
+
+    def save(self):
+        with self._lock:
+            if not self._dirty:
+                return
+            index = {'version': SEGMENT_CACHE_VERSION, 'segments': self._entries}
+            tmp_path = self._index_path() + '.tmp'
+            try:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(index, f, ensure_ascii=False)
+                os.replace(tmp_path, self._index_path())
+                self._dirty = False
+            except OSError as e:
+                print(f"[-] 分片缓存索引写入失败: {e}")
@@ -0,0 +1,158 @@
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from core.http_retry import retry_delay
+
+# ==================== B站弹幕分片 (seg.so) 并发下载 ====================
+
+SEGMENT_URL = "https://api.bilibili.com/x/v2/dm/web/seg.so"
+SEGMENT_SECONDS = 360   # 每个弹幕分片覆盖 6 分钟
+# 限流与服务端临时错误，值得退避后重试
+RETRY_STATUS_CODES = {412, 429, 500, 502, 503, 504}
+
+def segment_count(duration):
+    """视频时长（秒）对应的弹幕分片数"""
+    return math.ceil(duration / SEGMENT_SECONDS)
+
+class TokenBucket:
+    """令牌桶限流：平均每秒 rate 个请求，允许 capacity 个的突发。线程安全。"""
+
+    def __init__(self, rate, capacity=1):
+        self.rate = float(rate)
+        self.capacity = max(1.0, float(capacity))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class SegmentFetcher:
+    """
+    弹幕分片下载器：共用一个 requests.Session（连接复用），最多 max_workers 个请求同时进行，
+    令牌桶限制每秒请求数，限流 / 服务端错误 / 网络错误按带抖动的指数退避重试。
+    多个分P的分片放进同一个线程池，结果按 (分P, 分片序号) 顺序重新组装。
+    传入 cache (SegmentCache) 时，未过期的分片直接读缓存；过期的分片带条件请求头重新请求，
+    请求失败时退回旧的缓存内容。
+    """
+
+    def __init__(self, headers=None, max_workers=4, rate=8.0, burst=4, max_retries=3,
+                 backoff=0.5, timeout=15, base_url=SEGMENT_URL, cache=None):
+        self.max_workers = max(1, int(max_workers))
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.base_url = base_url
+        self.cache = cache
+        self.requests_sent = 0
+        self._count_lock = threading.Lock()
+        self.bucket = TokenBucket(rate, burst)
+        self.session = requests.Session()
+        if headers:
+            self.session.headers.update(headers)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_workers)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _retry_delay(self, attempt, response=None):
+        return retry_delay(attempt, self.backoff, response)
+
+    def _request(self, cid, aid, segment_index, headers=None):
+        """请求一个分片，返回状态码为 200 / 304 的响应；重试后仍失败时返回 None"""
+        params = {'type': 1, 'oid': cid, 'pid': aid, 'segment_index': segment_index}
+        for attempt in range(self.max_retries + 1):
+            last_attempt = attempt == self.max_retries
+            self.bucket.acquire()
+            with self._count_lock:
+                self.requests_sent += 1
+            try:
+                resp = self.session.get(self.base_url, params=params, headers=headers, timeout=self.timeout)
+            except requests.RequestException as e:
+                if last_attempt:
+                    print(f"\n[-] 分片 {cid}#{segment_index} 下载失败: {e}")
+                    return None
+                time.sleep(self._retry_delay(attempt))
+                continue
+
+            if resp.status_code in (200, 304):
+                return resp
+            if resp.status_code not in RETRY_STATUS_CODES or last_attempt:
+                print(f"\n[-] 分片 {cid}#{segment_index} 下载失败: HTTP {resp.status_code}")
+                return None
+            time.sleep(self._retry_delay(attempt, resp))
+
+    def fetch_segment(self, cid, aid, segment_index):
+        """下载一个分片，返回原始 protobuf 字节；没有弹幕、接口返回错误 JSON 或重试后仍失败时返回 None"""
+        cache = self.cache
+        entry = cache.lookup(cid, segment_index) if cache else None
+        if entry is not None and not cache.is_stale(entry):
+            payload = cache.read(cid, segment_index)
+            if payload is not None:
+                return payload
+            entry = None
+
+        resp = self._request(
+            cid, aid, segment_index, cache.conditional_headers(entry) if entry is not None else None
+        )
+        if resp is None:
+            # 请求失败时退回旧的缓存内容
+            return cache.read(cid, segment_index) if entry is not None else None
+        if resp.status_code == 304:
+            if entry is None:
+                return None
+            cache.touch(cid, segment_index)
+            return cache.read(cid, segment_index)
+
+        content = resp.content
+        if content.startswith(b'{') and b'"code":' in content:
+            return None
+        if cache:
+            cache.store(
+                cid, segment_index, content,
+                etag=resp.headers.get('ETag'), last_modified=resp.headers.get('Last-Modified')
+            )
+        return content
+
+    def fetch_pages(self, jobs, on_progress=None):
+        """
+        jobs 为 [(cid, aid, 分片数), ...]，返回与 jobs 对应的分片内容列表 [[分片1, 分片2, ...], ...]，
+        每页内按 segment_index 排序（失败的分片为 None）。on_progress(已完成, 总数) 在每个分片完成时调用。
+        """
+        tasks = [
+            (page_idx, cid, aid, segment_index)
+            for page_idx, (cid, aid, total) in enumerate(jobs)
+            for segment_index in range(1, total + 1)
+        ]
+        results = [[None] * total for _, _, total in jobs]
+        done = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(self.fetch_segment, cid, aid, segment_index): (page_idx, segment_index)
+                for page_idx, cid, aid, segment_index in tasks
+            }
+            for future in as_completed(futures):
+                page_idx, segment_index = futures[future]
+                results[page_idx][segment_index - 1] = future.result()
+                done += 1
+                if on_progress:
+                    on_progress(done, len(tasks))
+        return results
+
+    def close(self):
+        self.session.close()